@@ -1,4 +1,8 @@
-from pytab import core
+import time
+
+IMPORT_STARTED = time.perf_counter()  # Before core and its imports, for --timings
+
+from pytab import core  # noqa: E402
 
 
 def run():
@@ -17,23 +17,170 @@
 #    along with this program.  If not, see <https://www.gnu.org/licenses/>.
 #
 ##########################################################################################
-from json import JSONDecodeError, load
+import os
+import random
+import threading
+import time
+from hashlib import sha256
+from json import JSONDecodeError, dump, load, loads
 
 import click
-import requests
 
+TIMEOUT = (5, 30)  # Connect / read timeout in seconds
+MAX_RETRIES = 5
+BACKOFF_BASE = 1  # Seconds, doubled per retry
+BACKOFF_MAX = 60  # Also caps the wait requested by Retry-After
+RETRY_STATUS = (429, 500, 502, 503, 504)
+POOL_SIZE = 32  # Connections kept per host (parallel downloads)
 
-def getPlatform(server_url: str) -> list:
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    # One pooled session shared by all requests (and download threads)
+    global _session
+    with _session_lock:
+        if _session is None:
+            import requests  # Slow to load, only needed when talking to the server
+
+            _session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(
+                pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE
+            )
+            _session.mount("http://", adapter)
+            _session.mount("https://", adapter)
+        return _session
+
+
+def retry_delay(attempt: int, retry_after: str = None) -> float:
+    # Server requested wait (Retry-After), else exponential backoff with jitter
+    if retry_after:
+        try:
+            delay = float(retry_after)
+        except ValueError:  # HTTP date
+            from email.utils import parsedate_to_datetime
+
+            try:
+                delay = parsedate_to_datetime(retry_after).timestamp() - time.time()
+            except (TypeError, ValueError):
+                delay = None
+        if delay is not None:
+            return min(max(delay, 0), BACKOFF_MAX)
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2**attempt))
+
+
+def request(url: str, notify: bool = False, **kwargs):
+    # GET with timeouts, retrying connection errors and overload responses
+    import requests
+
+    kwargs.setdefault("timeout", TIMEOUT)
+    session = get_session()
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            response = session.get(url, **kwargs)
+        except (requests.ConnectionError, requests.Timeout):
+            if attempt == MAX_RETRIES:
+                raise
+            delay = retry_delay(attempt)
+        else:
+            if response.status_code not in RETRY_STATUS or attempt == MAX_RETRIES:
+                return response
+            delay = retry_delay(attempt, response.headers.get("Retry-After"))
+            response.close()
+        if notify:
+            click.echo(f" retry in {delay:.0f}s...", nl=False)
+        time.sleep(delay)
+
+
+def platforms_url(server_url: str) -> str:
+    return f"{server_url}/api/v1/TestDataApi/Platforms"
+
+
+def test_data_url(server_url: str, platformID: str) -> str:
+    return f"{server_url}/api/v1/TestDataApi?platformId={platformID}"
+
+
+def response_cache_path(cache_dir: str, url: str) -> str:
+    # Plain JSON body of the last response, loadable like a local test-file
+    return os.path.join(cache_dir, "server", f"{sha256(url.encode()).hexdigest()}.json")
+
+
+def read_cached(cache_dir: str, url: str):
+    # Last stored response for url, None if there is none
+    try:
+        with open(response_cache_path(cache_dir, url), "r") as file:
+            return load(file)
+    except (OSError, JSONDecodeError):
+        return None
+
+
+def cached_get(url: str, cache_dir: str = None, notify: bool = False) -> tuple:
+    # GET a JSON document, revalidating a stored copy via ETag / Last-Modified
+    # Returns (status_code, data), a 304 reply returns (200, stored data)
+    body_path = response_cache_path(cache_dir, url) if cache_dir else None
+    meta_path = f"{os.path.splitext(body_path)[0]}.meta.json" if cache_dir else None
+    meta = {}
+    headers = {}
+    if cache_dir and os.path.exists(body_path):
+        try:
+            with open(meta_path, "r") as file:
+                meta = load(file)
+        except (OSError, JSONDecodeError):
+            meta = {}
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+    response = request(url, notify=notify, headers=headers)
+    if response.status_code == 304 and headers:
+        data = read_cached(cache_dir, url)
+        if data is not None:
+            return 200, data
+        response = request(url, notify=notify)  # Stored copy is unusable
+    if response.status_code != 200:
+        return response.status_code, None
+
+    data = loads(response.content)
+    if cache_dir:
+        os.makedirs(os.path.dirname(body_path), exist_ok=True)
+        with open(f"{body_path}.tmp", "wb") as file:
+            file.write(response.content)
+        os.replace(f"{body_path}.tmp", body_path)
+        with open(meta_path, "w") as file:
+            dump(
+                {
+                    "url": url,
+                    "etag": response.headers.get("ETag"),
+                    "last_modified": response.headers.get("Last-Modified"),
+                },
+                file,
+            )
+    return 200, data
+
+
+def getPlatform(server_url: str, cache_dir: str = None, offline: bool = False) -> list:
     click.echo("| Fetch Supported Platforms...", nl=False)
     platforms = None
+    if offline:  # Platform list of the last online run
+        platforms = read_cached(cache_dir, platforms_url(server_url))
+        if platforms is None:
+            click.echo(" Error")
+            click.echo("ERROR: No cached platform list, run once while online")
+            click.pause("Press any key to exit")
+            exit()
+        click.echo(" success! (offline)")
+        return platforms["platforms"]
     try:
-        response = requests.get(f"{server_url}/api/v1/TestDataApi/Platforms")
-        if response.status_code == 200:
+        status_code, platforms = cached_get(
+            platforms_url(server_url), cache_dir, notify=True
+        )
+        if status_code == 200:
             click.echo(" success!")
-            platforms = response.json()
         else:
             click.echo(" Error")
-            click.echo(f"ERROR: Server replied with {response.status_code}")
+            click.echo(f"ERROR: Server replied with {status_code}")
             click.pause("Press any key to exit")
             exit()
     except Exception:
@@ -44,8 +191,9 @@ def getPlatform(server_url: str) -> list:
     return platforms
 
 
-def getTestData(platformID: str, platforms_data: list, server_url: str) -> tuple:
-    # If Return Code 429, message = retry_after - header
+def getTestData(
+    platformID: str, platforms_data: list, server_url: str, cache_dir: str = None
+) -> tuple:
     valid = True
     click.echo("| Loading tests... ", nl=False)
 
@@ -82,15 +230,14 @@ def getTestData(platformID: str, platforms_data: list, server_url: str) -> tuple
         exit()
 
     try:
-        response = requests.get(
-            f"{server_url}/api/v1/TestDataApi?platformId={current_platform}"
+        status_code, test_data = cached_get(
+            test_data_url(server_url, current_platform), cache_dir, notify=True
         )
-        if response.status_code == 200:
+        if status_code == 200:
             click.echo(" success!")
-            test_data = response.json()
         else:
             click.echo(" Error")
-            click.echo(f"ERROR: Server replied with {response.status_code}")
+            click.echo(f"ERROR: Server replied with {status_code}")
             click.pause("Press any key to exit")
             exit()
     except Exception:
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+
+# pytab.cache.py
+# A transcoding hardware benchmarking client (for Jellyfin)
+#    Copyright (C) 2024 BotBlake <B0TBlake@protonmail.com>
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, version 3 of the License.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+##########################################################################################
+import os
+import time
+from hashlib import sha256
+from json import JSONDecodeError, dump, dumps, load
+
+RESULTS_DIR = "results"  # Test results, the only entries subject to eviction
+
+
+def hardware_fingerprint(system_info: dict, driver_versions: dict) -> dict:
+    # The parts of the system info that influence transcoding results
+    # lshw only names the GPU driver module, driver_versions (hwi) adds versions
+    return {
+        "cpu": [cpu.get("product") for cpu in system_info["cpu"]],
+        "gpu": [
+            [gpu.get("product"), gpu.get("configuration", {}).get("driver")]
+            for gpu in system_info["gpu"]
+        ],
+        "memory": [
+            [memory.get("size"), memory.get("units")]
+            for memory in system_info["memory"]
+        ],
+        "drivers": driver_versions,
+    }
+
+
+def cache_key(*parts) -> str:
+    return sha256(dumps(parts, sort_keys=True).encode()).hexdigest()
+
+
+def read_cache(cache_dir: str, key: str, ttl: float) -> dict:
+    # Cached test data, None if missing or older than ttl seconds
+    entry_path = os.path.join(cache_dir, RESULTS_DIR, f"{key}.json")
+    try:
+        with open(entry_path, "r") as file:
+            entry = load(file)
+    except (OSError, JSONDecodeError):
+        return None
+    if time.time() - entry["created"] > ttl:
+        os.remove(entry_path)
+        return None
+    os.utime(entry_path)  # Last use, for eviction
+    return entry["test_data"]
+
+
+def write_cache(cache_dir: str, key: str, test_data: dict, max_bytes: int) -> None:
+    os.makedirs(os.path.join(cache_dir, RESULTS_DIR), exist_ok=True)
+    entry_path = os.path.join(cache_dir, RESULTS_DIR, f"{key}.json")
+    with open(f"{entry_path}.tmp", "w") as file:
+        dump({"created": time.time(), "test_data": test_data}, file)
+    os.replace(f"{entry_path}.tmp", entry_path)
+    evict(cache_dir, max_bytes)
+
+
+def evict(cache_dir: str, max_bytes: int) -> None:
+    # Remove the least recently used entries until the cache fits max_bytes
+    entries = []
+    for entry in os.scandir(os.path.join(cache_dir, RESULTS_DIR)):
+        if entry.name.endswith(".json"):
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        os.remove(path)
+        total -= size
+
+
+def read_session_limit(cache_dir: str, key: str) -> tuple:
+    # (found, limit) of an earlier encoder session probe, limit None = unlimited
+    try:
+        with open(os.path.join(cache_dir, "session_limits.json"), "r") as file:
+            limits = load(file)
+    except (OSError, JSONDecodeError):
+        return False, None
+    if key not in limits:
+        return False, None
+    return True, limits[key]
+
+
+def write_session_limit(cache_dir: str, key: str, limit: int) -> None:
+    limits_path = os.path.join(cache_dir, "session_limits.json")
+    try:
+        with open(limits_path, "r") as file:
+            limits = load(file)
+    except (OSError, JSONDecodeError):
+        limits = {}
+    limits[key] = limit
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(f"{limits_path}.tmp", "w") as file:
+        dump(limits, file)
+    os.replace(f"{limits_path}.tmp", limits_path)
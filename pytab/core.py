@@ -17,15 +17,25 @@
 #    along with this program.  If not, see <https://www.gnu.org/licenses/>.
 #
 ##########################################################################################
+import concurrent.futures
+import contextlib
+import functools
 import os
+import threading
+import time
 from hashlib import sha256
-from json import dump, dumps
+from json import JSONDecodeError, dump, dumps, load
 from shutil import rmtree, unpack_archive
 
 import click
-from requests import get as reqGet
 
-from pytab import api, hwi, worker
+from pytab import IMPORT_STARTED, api, cache, hwi, journal, staging, worker
+
+CHUNK_SIZE = 1024 * 1024  # Read/Download files in blocks of 1M
+MANIFEST_NAME = ".pytab_manifest.json"  # Checksums of already verified files
+EXTRACT_STAMP = ".pytab_extracted"  # Hash of the archive a tree was unpacked from
+
+_manifest_lock = threading.Lock()
 
 
 def match_hash(hash_dict: dict, output: bool) -> tuple:
@@ -57,31 +67,165 @@ def match_hash(hash_dict: dict, output: bool) -> tuple:
 def calculate_sha256(file_path: str) -> str:
     # Calculate SHA256 checksum of a file
     sha256_hash = sha256()
-    with open(file_path, "rb") as f:
-        # Read and update hash string value in blocks of 4K
-        for byte_block in iter(lambda: f.read(4096), b""):
-            sha256_hash.update(byte_block)
+    buffer = bytearray(CHUNK_SIZE)
+    view = memoryview(buffer)
+    with open(file_path, "rb", buffering=0) as f:
+        # Read and update hash string value in blocks of 1M (reusing one buffer)
+        for size in iter(lambda: f.readinto(buffer), 0):
+            sha256_hash.update(view[:size])
     return sha256_hash.hexdigest()
 
 
+def _file_signature(file_path: str) -> list:
+    stat = os.stat(file_path)
+    return [stat.st_size, stat.st_mtime_ns, stat.st_ino]
+
+
+def read_manifest(target_path: str) -> dict:
+    try:
+        with open(os.path.join(target_path, MANIFEST_NAME), "r") as file:
+            return load(file)
+    except (OSError, JSONDecodeError):
+        return {}
+
+
+def update_manifest(file_path: str, checksum: str) -> None:
+    # Record (or with checksum=None remove) the checksum of file_path
+    target_path, filename = os.path.split(file_path)
+    manifest_path = os.path.join(target_path, MANIFEST_NAME)
+    with _manifest_lock:
+        manifest = read_manifest(target_path)
+        if checksum is None:
+            manifest.pop(filename, None)
+        else:
+            manifest[filename] = {
+                "signature": _file_signature(file_path),
+                "sha256": checksum,
+            }
+        with open(f"{manifest_path}.tmp", "w") as file:
+            dump(manifest, file, indent=4)
+        os.replace(f"{manifest_path}.tmp", manifest_path)
+
+
+def verified_sha256(file_path: str, reverify: bool = False) -> str:
+    # SHA256 of file_path, taken from the manifest while the file is unchanged
+    target_path, filename = os.path.split(file_path)
+    if not reverify:
+        entry = read_manifest(target_path).get(filename)
+        if entry and entry["signature"] == _file_signature(file_path):
+            return entry["sha256"]
+    checksum = calculate_sha256(file_path)
+    update_manifest(file_path, checksum)
+    return checksum
+
+
+class RateLimiter:
+    # Token bucket shared by all download threads, rate in bytes per second
+    # While inactive (or without a rate) downloads run at full speed
+    def __init__(self, rate: float = None):
+        self.rate = rate
+        self.active = True
+        self._allowance = rate or 0  # Allows a burst of one second
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def consume(self, size: int) -> None:
+        if not self.rate or not self.active:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._allowance = min(
+                self.rate, self._allowance + (now - self._last) * self.rate
+            )
+            self._last = now
+            self._allowance -= size
+            delay = -self._allowance / self.rate if self._allowance < 0 else 0
+        time.sleep(delay)
+
+
+def download_stream(
+    source_url: str, part_path: str, progress=None, cancel_event=None, limiter=None
+) -> tuple:
+    # Stream source_url into part_path, hashing every chunk as it arrives
+    # An existing part_path (interrupted download) is resumed via HTTP Range
+    # progress(done, total) is called per chunk, cancel_event aborts the transfer
+    # and limiter (RateLimiter) caps the bandwidth
+    sha256_hash = sha256()
+    offset = 0
+    if os.path.exists(part_path):
+        with open(part_path, "rb") as f:  # Hash the data we already have
+            for byte_block in iter(lambda: f.read(CHUNK_SIZE), b""):
+                sha256_hash.update(byte_block)
+                offset += len(byte_block)
+
+    headers = {"Range": f"bytes={offset}-"} if offset else {}
+    with api.request(source_url, headers=headers, stream=True) as response:
+        content_range = response.headers.get("Content-Range", "")
+        if response.status_code == 206 and content_range.startswith(f"bytes {offset}-"):
+            mode = "ab"  # Server continues where we stopped
+        elif response.status_code == 200:
+            mode = "wb"  # No (usable) range support, start over
+            sha256_hash = sha256()
+            offset = 0
+        elif response.status_code == 416 and offset:
+            return True, sha256_hash.hexdigest()  # Partial file is already complete
+        elif response.status_code == 206 and offset:
+            mode = None  # Range does not match ours, start over without a Range
+        else:
+            return False, response.status_code  # Unable to download file
+
+        if mode is None:  # The .part file would never resume, drop it
+            response.close()
+            os.remove(part_path)
+            return download_stream(
+                source_url, part_path, progress, cancel_event, limiter
+            )
+
+        done = offset
+        total = offset + int(response.headers.get("Content-Length", 0))
+        with open(part_path, mode) as f:
+            for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                if cancel_event is not None and cancel_event.is_set():
+                    return False, "Cancelled"  # .part is kept for a later resume
+                f.write(chunk)
+                sha256_hash.update(chunk)
+                done += len(chunk)
+                if progress is not None:
+                    progress(done, total)
+                if limiter is not None:
+                    limiter.consume(len(chunk))
+            f.flush()
+            os.fsync(f.fileno())
+    return True, sha256_hash.hexdigest()
+
+
 def obtainSource(
-    target_path: str, source_url: str, hash_dict: dict, notify_on_download: bool
+    target_path: str,
+    source_url: str,
+    hash_dict: dict,
+    notify_on_download: bool,
+    progress=None,
+    cancel_event=None,
+    reverify: bool = False,
+    limiter=None,
 ) -> tuple:
     hash_algorithm, source_hash = match_hash(hash_dict, notify_on_download)
 
     target_path = os.path.realpath(target_path)  # Relative Path!
     filename = os.path.basename(source_url)  # Extract filename from the URL
     file_path = os.path.join(target_path, filename)  # path/filename
+    part_path = f"{file_path}.part"  # Download target until checksum is verified
 
     if os.path.exists(file_path):  # if file already exists
         existing_checksum = None
-        if hash_algorithm == "sha256":
-            existing_checksum = calculate_sha256(file_path)  # checksum validation
+        if hash_algorithm == "sha256":  # checksum validation
+            existing_checksum = verified_sha256(file_path, reverify)
 
         if existing_checksum == source_hash or source_hash is None:  # if valid/no sum
             return True, file_path  # Checksum valid, no need to download again
         else:
             os.remove(file_path)  # Delete file if checksum doesn't match
+            update_manifest(file_path, None)
 
     # Create target path if non present
     if not os.path.exists(target_path):
@@ -90,43 +234,242 @@ def obtainSource(
     if notify_on_download:
         click.echo("Downloading file...", nl=False)
 
-    try:  # Download file
-        response = reqGet(source_url)
-        if response.status_code == 200:
-            with open(file_path, "wb") as f:
-                f.write(response.content)
-            if notify_on_download:
-                click.echo(" success!")
-        else:
-            return False, response.status_code  # Unable to download file
+    try:  # Download file (keeps the .part file on error, to resume next time)
+        success, output = download_stream(
+            source_url, part_path, progress, cancel_event, limiter
+        )
+        if not success:
+            return False, output  # Unable to download file
     except Exception:
         return False, "Unknown Error!"  # Unable to download file
-    downloaded_checksum = calculate_sha256(file_path)  # checksum validation
+    if notify_on_download:
+        click.echo(" success!")
+
+    downloaded_checksum = output  # checksum validation (hashed while downloading)
     if downloaded_checksum == source_hash or source_hash is None:  # if valid/no sum
+        os.replace(part_path, file_path)  # Atomic rename, file is complete
+        if hash_algorithm == "sha256":
+            update_manifest(file_path, downloaded_checksum)
         return True, file_path  # Checksum valid
     else:
-        os.remove(file_path)  # Delete file if checksum doesn't match
+        os.remove(part_path)  # Delete file if checksum doesn't match
         return False, "Invalid Checksum!"  # Checksum invalid
 
 
+def _progress_reporter(progress: dict, name: str):
+    # Callback for download_stream, storing the transfer state of one file
+    def report(done: int, total: int) -> None:
+        progress[name] = (done, total)
+
+    return report
+
+
+def _fetch_label(finished: int, count: int, progress: dict) -> str:
+    active = []
+    # Snapshot, the download threads add entries while we iterate
+    for name, (done, total) in list(progress.items()):
+        if total:
+            active.append(f"{name} {done * 100 // total:d}%")
+        else:
+            active.append(f"{name} {done // 1024**2}MB")
+    label = f"Fetching | Files: {finished:02d}/{count:02d}"
+    if active:
+        label += " | " + ", ".join(active[:3])
+    return label
+
+
+def verifySources(files: list, target_path: str, reverify: bool) -> None:
+    # Hash all existing, not yet verified files in parallel threads
+    # (hashlib releases the GIL), so obtainSource finds them in the manifest
+    target_path = os.path.realpath(target_path)
+    manifest = read_manifest(target_path)
+    file_paths = []
+    for file in files:
+        hash_algorithm, _ = match_hash(file["source_hashs"], False)
+        filename = os.path.basename(file["source_url"])
+        file_path = os.path.join(target_path, filename)
+        if hash_algorithm != "sha256" or not os.path.exists(file_path):
+            continue
+        entry = manifest.get(filename)
+        if reverify or not entry or entry["signature"] != _file_signature(file_path):
+            file_paths.append(file_path)
+    if not file_paths:
+        return
+
+    max_workers = min(len(file_paths), os.cpu_count() or 1)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        with click.progressbar(
+            executor.map(lambda path: verified_sha256(path, True), file_paths),
+            length=len(file_paths),
+            label="Verifying existing files...",
+        ) as prog_bar:
+            for _ in prog_bar:
+                pass
+
+
+def fetchSources(
+    files: list, target_path: str, download_jobs: int, reverify: bool = False
+) -> tuple:
+    # Obtain all test files with up to download_jobs transfers at once
+    # The first failure cancels all other transfers
+    verifySources(files, target_path, reverify)
+    cancel_event = threading.Event()
+    progress = {}  # name: (done, total) bytes, written by the download threads
+    failure = None
+    with concurrent.futures.ThreadPoolExecutor(max_workers=download_jobs) as executor:
+        futures = {}
+        for file in files:
+            name = os.path.basename(file["name"])
+            future = executor.submit(
+                obtainSource,
+                target_path,
+                file["source_url"],
+                file["source_hashs"],
+                False,
+                _progress_reporter(progress, name),
+                cancel_event,
+            )
+            futures[future] = name
+
+        pending = set(futures)
+        with click.progressbar(length=len(files), label="Fetching...") as prog_bar:
+            while pending and not failure:
+                done, pending = concurrent.futures.wait(
+                    pending, timeout=0.5, return_when=concurrent.futures.FIRST_COMPLETED
+                )
+                for future in done:
+                    try:
+                        success, output = future.result()
+                    except Exception as e:
+                        success, output = False, e
+                    progress.pop(futures[future], None)
+                    if success:
+                        prog_bar.update(1)
+                    elif not failure:
+                        failure = f'"{futures[future]}": {output}'
+                prog_bar.label = _fetch_label(prog_bar.pos, len(files), progress)
+                prog_bar.render_progress()
+
+            if failure:  # Stop all other transfers
+                cancel_event.set()
+                for future in pending:
+                    future.cancel()
+    if failure:
+        return False, failure
+    return True, None
+
+
+class SourcePipeline:
+    # Downloads the test files in the background, in order, while the already
+    # available ones are benchmarked. Bandwidth is limited while a benchmark
+    # runs and unlimited while the benchmark waits for its file.
+    def __init__(
+        self, files: list, target_path: str, download_jobs: int, rate_limit: float
+    ):
+        self._limiter = RateLimiter(rate_limit)
+        self._cancel_event = threading.Event()
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=download_jobs
+        )
+        self._futures = [
+            self._executor.submit(
+                obtainSource,
+                target_path,
+                file["source_url"],
+                file["source_hashs"],
+                False,
+                None,
+                self._cancel_event,
+                False,
+                self._limiter,
+            )
+            for file in files
+        ]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def wait(self, index: int) -> tuple:
+        # (success, file_path | error) of the index-th file
+        self._limiter.active = False
+        try:
+            return self._futures[index].result()
+        except Exception as e:
+            return False, e
+        finally:
+            self._limiter.active = True
+
+    def close(self) -> None:
+        # Aborts all unfinished downloads (.part files are kept)
+        self._cancel_event.set()
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+
 def unpackArchive(archive_path, target_path):
-    if os.path.exists(target_path):
-        rmtree(target_path)
+    # Skip extraction if target_path was unpacked from this exact archive
+    archive_hash = verified_sha256(archive_path)
+    stamp_path = os.path.join(target_path, EXTRACT_STAMP)
+    if os.path.exists(stamp_path):
+        with open(stamp_path, "r") as stamp:
+            if stamp.read().strip() == archive_hash:
+                click.echo(
+                    "INFO: "
+                    + click.style("Archive already unpacked, skipping.", fg="cyan")
+                )
+                return
+
+    # Unpack next to target_path first, so a failed run never leaves a broken tree
+    staging_path = f"{target_path}.new"
+    if os.path.exists(staging_path):
+        rmtree(staging_path)
+    os.makedirs(staging_path)
+
+    click.echo("Unpacking Archive...", nl=False)
+    if archive_path.endswith((".zip", ".tar.gz", ".tar.xz")):
+        unpack_archive(archive_path, staging_path)
+    with open(os.path.join(staging_path, EXTRACT_STAMP), "w") as stamp:
+        stamp.write(archive_hash)
+    click.echo(" success!")
+
+    if os.path.exists(target_path):  # Swap in the new tree
+        old_path = f"{target_path}.old"
+        if os.path.exists(old_path):
+            rmtree(old_path)
+        os.rename(target_path, old_path)
+        os.rename(staging_path, target_path)
+        rmtree(old_path)
         click.echo(
             "INFO: "
             + click.style("Replacing existing files with validated ones.", fg="cyan")
         )
-    os.makedirs(target_path)
+    else:
+        os.rename(staging_path, target_path)
 
-    click.echo("Unpacking Archive...", nl=False)
-    if archive_path.endswith((".zip", ".tar.gz", ".tar.xz")):
-        unpack_archive(archive_path, target_path)
-    click.echo(" success!")
 
+def _run_round(total_workers: int, ffmpeg_cmd: str, config: dict, runs: list):
+    # One workMan round, with a timeout derived from source and last passing run
+    last_run = runs[-1] if runs else None
+    timeout = worker.round_timeout(
+        config.get("source_duration"), last_run, total_workers, config
+    )
+    output = worker.workMan(total_workers, ffmpeg_cmd, {**config, "timeout": timeout})
+    if not output[0] and output[1].get("thermal", {}).get("throttled"):
+        if config["debug"]:
+            click.echo(
+                f"> > > > Round throttled! Cooling down for {config['cooldown']}s"
+            )
+        time.sleep(config["cooldown"])  # Let the hardware recover
+    return output
 
-def benchmark(ffmpeg_cmd: str, debug_flag: bool, prog_bar) -> tuple:
+
+def _scale_walk(ffmpeg_cmd: str, debug_flag: bool, prog_bar, config: dict) -> tuple:
+    # Legacy search: add int(speed) workers per passing run, scale back one by one
     runs = []
-    total_workers = 1
+    max_workers = config["max_workers"]
+    total_workers = min(config["start_workers"], max_workers or float("inf"))
     run = True
     last_speed = -0.5  # to Assure first worker always has the required difference
     formatted_last_speed = "00.00"
@@ -137,12 +480,21 @@ def benchmark(ffmpeg_cmd: str, debug_flag: bool, prog_bar) -> tuple:
         if not debug_flag:
             prog_bar.label = f"Testing | Workers: {total_workers:02d} | Last Speed: {formatted_last_speed}"
             prog_bar.render_progress()
-        output = worker.workMan(total_workers, ffmpeg_cmd)
+        output = _run_round(total_workers, ffmpeg_cmd, config, runs)
         # First check if we continue Running:
         # Stop when first run failed
         if output[0] and total_workers == 1:
             run = False
             failure_reason.append(output[1])
+        # Calibrated start too optimistic (failed or too slow): retry with half
+        elif (
+            last_speed == -0.5
+            and total_workers > 1
+            and (output[0] or output[1]["speed"] < 1)
+        ):
+            total_workers //= 2
+            if debug_flag:
+                click.echo(f"> > > > Start too slow, halving to: {total_workers}")
         # When run after scaleback succeded:
         elif (last_speed < 1 and not output[0]) and last_speed != -0.5:
             limited = False
@@ -150,6 +502,8 @@ def benchmark(ffmpeg_cmd: str, debug_flag: bool, prog_bar) -> tuple:
                 limited = True
             last_speed = output[1]["speed"]
             formatted_last_speed = f"{last_speed:05.2f}"
+            if not runs:  # Started above the limit, this is the only passing run
+                runs.append(output[1])
             if debug_flag:
                 click.echo(
                     f"> > > > Scaleback success! Limit: {limited}, Total Workers: {total_workers}, Speed: {last_speed}"
@@ -187,15 +541,93 @@ def benchmark(ffmpeg_cmd: str, debug_flag: bool, prog_bar) -> tuple:
         # elif output[1]["speed"]-last_speed < 0.5:
         #    run = False
         #    failure_reason.append("failed_inconclusive")
+        elif max_workers and total_workers >= max_workers:  # Passed at the limit
+            runs.append(output[1])
+            last_speed = output[1]["speed"]
+            formatted_last_speed = f"{last_speed:05.2f}"
+            run = False
+            failure_reason.append("limited")
         else:  # When no failure happened
             runs.append(output[1])
             last_speed = output[1]["speed"]
             total_workers += int(last_speed)
+            if max_workers:  # No full rounds beyond the known hard limit
+                total_workers = min(total_workers, max_workers)
             formatted_last_speed = f"{last_speed:05.2f}"
             if debug_flag:
                 click.echo(
                     f"> > > > Workers: {total_workers}, Last Speed: {last_speed}"
                 )
+    return runs, failure_reason, formatted_last_speed
+
+
+def _scale_bisect(ffmpeg_cmd: str, debug_flag: bool, prog_bar, config: dict) -> tuple:
+    # Bracket the highest passing worker count (speed >= 1), then bisect it
+    runs = []
+    failure_reason = []
+    passed = 0  # Highest worker count that passed
+    failed = None  # Lowest worker count that failed
+    limited = False  # Whether "failed" was caused by worker errors (encoder limit)
+    max_workers = config["max_workers"]
+    total_workers = min(config["start_workers"], max_workers or float("inf"))
+    formatted_last_speed = "00.00"
+    while failed is None or failed - passed > 1:
+        if debug_flag:
+            click.echo(
+                f"> > > > Workers: {total_workers}, Bracket: {passed} - {failed}"
+            )
+        else:
+            prog_bar.label = f"Testing | Workers: {total_workers:02d} | Last Speed: {formatted_last_speed}"
+            prog_bar.render_progress()
+        output = _run_round(total_workers, ffmpeg_cmd, config, runs)
+
+        if output[0] and total_workers == 1:  # Stop when single worker failed
+            failure_reason.append(output[1])
+            return runs, failure_reason, formatted_last_speed
+        elif output[0]:  # Worker failures (e.g. NvEnc limit), upper bound
+            failed, limited = total_workers, True
+            formatted_last_speed = "sclbk"
+        elif output[1]["speed"] < 1:  # Too slow, upper bound
+            failed, limited = total_workers, False
+            formatted_last_speed = f"{output[1]['speed']:05.2f}"
+        else:  # Passed, lower bound
+            runs.append(output[1])
+            passed = total_workers
+            formatted_last_speed = f"{output[1]['speed']:05.2f}"
+
+        if failed is None:
+            # Still bracketing: jump to the capacity estimated from this run
+            # (at least one more, at most twice as many workers)
+            estimate = int(passed * output[1]["speed"])
+            total_workers = max(passed + 1, min(2 * passed, estimate))
+            if max_workers and passed >= max_workers:  # Known hard limit reached
+                failed, limited = passed + 1, True
+            elif max_workers:
+                total_workers = min(total_workers, max_workers)
+        else:
+            total_workers = (passed + failed) // 2
+
+    failure_reason.append("limited" if limited else "performance")
+    return runs, failure_reason, formatted_last_speed
+
+
+SCALING_STRATEGIES = {"walk": _scale_walk, "bisect": _scale_bisect}
+
+
+def benchmark(
+    ffmpeg_cmd: str,
+    debug_flag: bool,
+    prog_bar,
+    run_config: dict = None,
+    source_duration: float = None,
+) -> tuple:
+    config = {**worker.DEFAULT_RUN_CONFIG, **(run_config or {})}
+    config["source_duration"] = source_duration
+    config["debug"] = debug_flag
+    scale = SCALING_STRATEGIES[config["scaling"]]
+    runs, failure_reason, formatted_last_speed = scale(
+        ffmpeg_cmd, debug_flag, prog_bar, config
+    )
     if debug_flag:
         click.echo(f"> > > > Failed: {failure_reason}")
     if len(runs) > 0:
@@ -203,6 +635,9 @@ def benchmark(ffmpeg_cmd: str, debug_flag: bool, prog_bar) -> tuple:
         result = {
             "max_streams": max_streams,
             "failure_reasons": failure_reason,
+            "throttled_runs": sum(
+                1 for run in runs if run.get("thermal", {}).get("throttled")
+            ),
             "single_worker_speed": runs[(len(runs)) - 1]["speed"],
             "single_worker_rss_kb": runs[(len(runs)) - 1]["rss_kb"],
         }
@@ -215,6 +650,145 @@ def benchmark(ffmpeg_cmd: str, debug_flag: bool, prog_bar) -> tuple:
         return False, runs, {}
 
 
+def gpuSelections(
+    device_type: str, gpus: list, selected_gpus: list, gpu_mode: str
+) -> list:
+    # Device selections a test of device_type runs on: None for the CPU, a GPU
+    # index per matching GPU, or one list of all of them ("aggregate" mode)
+    if device_type == "cpu":
+        return [None]
+    gpu_ids = [gpu for gpu in selected_gpus if gpus[gpu]["vendor"] == device_type]
+    if gpu_mode == "aggregate" and gpu_ids:
+        return [gpu_ids]
+    return gpu_ids
+
+
+def calibrateTests(
+    files: list,
+    ffmpeg_binary: str,
+    supported_types: list,
+    gpus: list,
+    selected_gpus: list,
+    gpu_idx: int,
+) -> dict:
+    # Single stream speed of every test on a synthetic (lavfi) input, on every
+    # selected device. Returns the worker count to start each test with, by
+    # (test id, type, GPU index), the GPU index is None for CPU tests
+    jobs = []
+    for file in files:
+        for test in file["data"]:
+            for command in test["arguments"]:
+                if command["type"] == "cpu" and "cpu" in supported_types:
+                    jobs.append((test, command, None))
+                elif command["type"] in supported_types:
+                    for gpu in selected_gpus:
+                        if gpus[gpu]["vendor"] == command["type"]:
+                            jobs.append((test, command, gpu))
+    calibration = {}
+    with click.progressbar(jobs, label="Calibrating...") as prog_bar:
+        for test, command, gpu in prog_bar:
+            arguments = command["args"].format(
+                video_file="lavfi", gpu=gpu_idx if gpu is None else gpu
+            )
+            success, output = worker.calibrate(
+                f"{ffmpeg_binary} {arguments}", test["from_resolution"]
+            )
+            if success:
+                calibration[(test["id"], command["type"], gpu)] = worker.start_workers(
+                    output
+                )
+    click.echo(f"| Calibrated {len(calibration)} of {len(jobs)} tests")
+    return calibration
+
+
+def sessionLimit(
+    files: list, ffmpeg_binary: str, gpu: dict, gpu_idx: int, cache_dir: str
+) -> int:
+    # Encoder session limit of the selected GPU, probed once per driver version
+    # and encoder command
+    commands = [
+        command
+        for file in files
+        for test in file["data"]
+        for command in test["arguments"]
+        if command["type"] == gpu["vendor"]
+    ]
+    if not commands:
+        return None
+    arguments = commands[0]["args"].format(video_file="lavfi", gpu=gpu_idx)
+    key = cache.cache_key(
+        gpu.get("product"),
+        gpu.get("configuration"),
+        hwi.get_driver_versions(),
+        arguments,
+    )
+    found, limit = cache.read_session_limit(cache_dir, key)
+    if found:
+        return limit
+    click.echo("| Probing encoder session limit...", nl=False)
+    success, output = worker.probe_session_limit(f"{ffmpeg_binary} {arguments}")
+    if not success:  # Not cached, a failure may be transient (load, spawning)
+        click.echo(" Error")
+        click.echo(
+            "Note: " + click.style(f"Session probe failed: {output}", fg="yellow")
+        )
+        return None
+    click.echo(f" {output or 'unlimited'}")
+    cache.write_session_limit(cache_dir, key, output)
+    return output
+
+
+class TestStatus:
+    # Stands in for the progressbar of a test running next to others, only
+    # the main thread renders the progressbar (see runParallel)
+    def __init__(self):
+        self.label = "Starting"
+
+    def render_progress(self) -> None:
+        pass
+
+
+def runParallel(run_test, selections: list, prog_bar, render: bool = True) -> list:
+    # run_test(selection, status) for every selection at once, in order
+    statuses = [TestStatus() for _ in selections]
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(selections)) as executor:
+        futures = [
+            executor.submit(run_test, selection, status)
+            for selection, status in zip(selections, statuses)
+        ]
+        pending = set(futures)
+        while pending:
+            _, pending = concurrent.futures.wait(pending, timeout=0.5)
+            if not render:
+                continue
+            prog_bar.label = " || ".join(
+                f"GPU {selection}: {status.label}"
+                for selection, status in zip(selections, statuses)
+            )
+            prog_bar.render_progress()
+    return [future.result() for future in futures]
+
+
+class PhaseTimer:
+    # Wall clock time per phase of a run, reported with --timings
+    def __init__(self, started: float = None):
+        self.phases = []
+        self._last = time.perf_counter() if started is None else started
+
+    def mark(self, phase: str) -> None:
+        # Ends the current phase
+        now = time.perf_counter()
+        self.phases.append((phase, now - self._last))
+        self._last = now
+
+    def report(self) -> None:
+        click.echo(click.style("Timings", bold=True))
+        for phase, duration in self.phases:
+            click.echo(f"| {phase:<24} {duration:9.3f}s")
+        total = sum(duration for _, duration in self.phases)
+        click.echo(f"| {'total':<24} {total:9.3f}s")
+
+
 def output_json(data, file_path):
     # Create the directory if it doesn't exist
     os.makedirs(os.path.dirname(file_path), exist_ok=True)
@@ -283,6 +857,15 @@ CONTEXT_SETTINGS = dict(help_option_names=["-h", "--help"], max_content_width=12
     required=False,
     help="Select which gpu to use for testing",
 )
+@click.option(
+    "--gpu-mode",
+    "gpu_mode",
+    type=click.Choice(["single", "parallel", "aggregate"]),
+    default="single",
+    show_default=True,
+    help="Test one GPU, every GPU at once with its own workers, or all GPUs as one"
+    " (parallel/aggregate use all GPUs the server has tests for, --gpu may only be 0)",
+)
 @click.option(
     "--nocpu",
     "disable_cpu",
@@ -292,6 +875,165 @@ CONTEXT_SETTINGS = dict(help_option_names=["-h", "--help"], max_content_width=12
     default=False,
     help="Select whether or not to use your cpu(s) for testing",
 )
+@click.option(
+    "--download-jobs",
+    "download_jobs",
+    type=click.IntRange(min=1),
+    default=4,
+    show_default=True,
+    help="Number of test files to download in parallel",
+)
+@click.option(
+    "--pipeline",
+    "pipeline",
+    is_flag=True,
+    default=False,
+    help="Start benchmarking as soon as the first test file is available",
+)
+@click.option(
+    "--download-limit",
+    "download_limit",
+    type=click.FloatRange(min=0),
+    default=10,
+    show_default=True,
+    help="Bandwidth (MiB/s) of --pipeline downloads during tests, 0 for unlimited",
+)
+@click.option(
+    "--reverify",
+    "reverify",
+    is_flag=True,
+    default=False,
+    help="Re-hash all existing files instead of trusting the checksum manifest",
+)
+@click.option(
+    "--scaling",
+    "scaling",
+    type=click.Choice(["walk", "bisect"]),
+    default="walk",
+    show_default=True,
+    help="Worker scaling search (walk: step by speed, bisect: bracket and bisect)",
+)
+@click.option(
+    "--engine",
+    "engine",
+    type=click.Choice(["thread", "asyncio"]),
+    default="thread",
+    show_default=True,
+    help="Run ffmpeg workers in one thread each or in one asyncio event loop",
+)
+@click.option(
+    "--placement",
+    "placement",
+    type=click.Choice(["none", "cores", "numa"]),
+    default="none",
+    show_default=True,
+    help="Pin CPU test workers to their own cores (numa: keep each inside one node)",
+)
+@click.option(
+    "--stage",
+    "stage",
+    type=click.Choice(["none", "tmpfs", "pagecache"]),
+    default="none",
+    show_default=True,
+    help="Load each test video into RAM (tmpfs copy or page cache) before its tests",
+)
+@click.option(
+    "--sample-rate",
+    "sample_rate",
+    type=click.FloatRange(min=0),
+    default=2.0,
+    show_default=True,
+    help="Resource samples (CPU, RSS, I/O) per second and worker, 0 to disable",
+)
+@click.option(
+    "--thermal-limit",
+    "thermal_limit",
+    type=float,
+    default=90,
+    show_default=True,
+    help="Flag runs reaching this temperature (Celsius) as throttled",
+)
+@click.option(
+    "--cooldown",
+    "cooldown",
+    type=click.FloatRange(min=0),
+    default=0,
+    show_default=True,
+    help="Seconds to pause after a throttled run",
+)
+@click.option(
+    "--calibrate",
+    "calibrate",
+    is_flag=True,
+    default=False,
+    help="Estimate the first worker count of each test on a synthetic input",
+)
+@click.option(
+    "--session-probe/--no-session-probe",
+    "session_probe",
+    default=True,
+    show_default=True,
+    help="Probe the encoder session limit of the GPU and never test beyond it",
+)
+@click.option(
+    "--steady-state",
+    "steady_state",
+    is_flag=True,
+    default=False,
+    help="End each run as soon as all workers report a stable speed",
+)
+@click.option(
+    "--early-abort/--no-early-abort",
+    "early_abort",
+    default=True,
+    show_default=True,
+    help="Abort runs as soon as their live speed falls clearly below 1x",
+)
+@click.option(
+    "--resume",
+    "resume",
+    is_flag=True,
+    default=False,
+    help="Skip tests already completed according to the journal of the last run",
+)
+@click.option(
+    "--cache-dir",
+    "cache_dir",
+    type=click.Path(file_okay=False, resolve_path=True),
+    default="./cache",
+    show_default=True,
+    help="Path for cached hardware info and results of earlier runs",
+)
+@click.option(
+    "--cache-ttl",
+    "cache_ttl",
+    type=click.FloatRange(min=0),
+    default=0,
+    show_default=True,
+    help="Reuse results of identical earlier tests for this many days (0: disabled)",
+)
+@click.option(
+    "--cache-size",
+    "cache_size",
+    type=click.IntRange(min=1),
+    default=64,
+    show_default=True,
+    help="Maximum size of the result cache in MiB",
+)
+@click.option(
+    "--offline",
+    "offline",
+    is_flag=True,
+    default=False,
+    help="Run the test plan cached by the last online run, without server access",
+)
+@click.option(
+    "--timings",
+    "timings",
+    is_flag=True,
+    default=False,
+    help="Report the time spent in each phase (startup, downloads, benchmark)",
+)
 @click.option(
     "--debug",
     "debug_flag",
@@ -305,7 +1047,29 @@ def cli(
     server_url: str,
     output_path: str,
     gpu_input: int,
+    gpu_mode: str,
     disable_cpu: bool,
+    download_jobs: int,
+    pipeline: bool,
+    download_limit: float,
+    reverify: bool,
+    scaling: str,
+    engine: str,
+    placement: str,
+    stage: str,
+    sample_rate: float,
+    thermal_limit: float,
+    cooldown: float,
+    calibrate: bool,
+    session_probe: bool,
+    steady_state: bool,
+    early_abort: bool,
+    resume: bool,
+    cache_dir: str,
+    cache_ttl: float,
+    cache_size: int,
+    offline: bool,
+    timings: bool,
     debug_flag: bool,
 ) -> None:
     """
@@ -313,6 +1077,8 @@ def cli(
     """
     global debug
     debug = debug_flag
+    timer = PhaseTimer(IMPORT_STARTED)
+    timer.mark("imports / startup")
 
     click.echo()
     if debug_flag:
@@ -324,6 +1090,14 @@ def cli(
         click.echo()
     click.echo(click.style("System Initialization", bold=True))
 
+    # Hardware discovery runs in the background while the server is contacted
+    hwinfo_executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+    system_info_future = hwinfo_executor.submit(
+        hwi.get_system_info, os.path.join(cache_dir, "hwinfo.json")
+    )
+    hwinfo_executor.shutdown(wait=False)
+
+    test_data_path = server_url
     if not server_url.startswith("http") and debug_flag:
         if os.path.exists(server_url):
             click.echo(
@@ -336,15 +1110,29 @@ def cli(
             click.echo("ERROR: Invalid Server URL", err=True)
             click.pause("Press any key to exit")
             exit()
+    elif offline:  # Test plan cached by the last online run, loaded like a local file
+        platforms = api.getPlatform(server_url, cache_dir, offline=True)
+        test_data_path = api.response_cache_path(
+            cache_dir, api.test_data_url(server_url, hwi.get_platform_id(platforms))
+        )
+        if not os.path.exists(test_data_path):
+            click.echo()
+            click.echo("ERROR: No cached tests, run once while online", err=True)
+            click.pause("Press any key to exit")
+            exit()
+        platforms = "local"
+        platform_id = "local"
     else:
         platforms = api.getPlatform(
-            server_url
+            server_url, cache_dir
         )  # obtain list of (supported) Platforms + ID's
         platform_id = hwi.get_platform_id(platforms)
 
+    timer.mark("server platforms")
     click.echo("| Obtaining System Information...", nl=False)
-    system_info = hwi.get_system_info()
+    system_info = system_info_future.result()
     click.echo(" success!")
+    timer.mark("hardware discovery")
 
     # Logic for Hardware Selection
     supported_types = []
@@ -356,7 +1144,16 @@ def cli(
     # GPU Logic
     gpus = system_info["gpu"]
 
-    if len(gpus) > 1 and gpu_input is None:
+    # Multi GPU modes take every GPU, --gpu can only disable them
+    if gpu_mode != "single" and gpu_input not in (None, 0):
+        click.echo()
+        click.echo(
+            f"ERROR: --gpu {gpu_input} conflicts with --gpu-mode {gpu_mode}", err=True
+        )
+        click.pause("Press any key to exit")
+        exit()
+
+    if len(gpus) > 1 and gpu_input is None and gpu_mode == "single":
         click.echo("\\")
         click.echo(" \\")
         click.echo("  \\_")
@@ -386,9 +1183,13 @@ def cli(
 
     gpu_idx = gpu_input - 1
 
-    # Appends the selected GPU to supported types
+    # Appends the selected GPU(s) to supported types
+    selected_gpus = []
     if gpu_input != 0:
-        supported_types.append(gpus[gpu_idx]["vendor"])
+        selected_gpus = [gpu_idx] if gpu_mode == "single" else list(range(len(gpus)))
+    for selected_gpu in selected_gpus:
+        if gpus[selected_gpu]["vendor"] not in supported_types:
+            supported_types.append(gpus[selected_gpu]["vendor"])
 
     # Error if all hardware disabled
     if gpu_input == 0 and disable_cpu:
@@ -397,21 +1198,56 @@ def cli(
         click.pause("Press any key to exit")
         exit()
 
+    if placement != "none" and not worker.pinning_supported():
+        click.echo(
+            "Note: "
+            + click.style("CPU pinning is not supported on this OS.", fg="yellow")
+        )
+        placement = "none"
+    topology = hwi.get_cpu_topology()
+    if stage not in staging.supported_modes():
+        click.echo(
+            "Note: "
+            + click.style(
+                f"Staging to {stage} is not supported on this OS.", fg="yellow"
+            )
+        )
+        stage = "none"
+    stage_budget = staging.memory_budget(system_info["memory"])
+
     # Stop Hardware Selection logic
 
-    valid, server_data = api.getTestData(platform_id, platforms, server_url)
+    valid, server_data = api.getTestData(
+        platform_id, platforms, test_data_path, cache_dir
+    )
     if not valid:
         click.echo(f"Cancled: {server_data}")
         exit()
+    if gpu_mode != "single":  # Skip GPUs without tests (e.g. BMC/VGA adapters)
+        test_types = {
+            command["type"]
+            for file in server_data["tests"]
+            for test in file["data"]
+            for command in test["arguments"]
+        }
+        for selected_gpu in list(selected_gpus):
+            if gpus[selected_gpu]["vendor"] not in test_types:
+                selected_gpus.remove(selected_gpu)
+                click.echo(f"| No tests for {gpus[selected_gpu]['product']}, skipped")
     click.echo(click.style("Done", fg="green"))
     click.echo()
+    timer.mark("test data")
 
     # Download ffmpeg
     ffmpeg_data = server_data["ffmpeg"]
     click.echo(click.style("Loading ffmpeg", bold=True))
 
     ffmpeg_download = obtainSource(
-        ffmpeg_path, ffmpeg_data["ffmpeg_source_url"], ffmpeg_data["ffmpeg_hashs"], True
+        ffmpeg_path,
+        ffmpeg_data["ffmpeg_source_url"],
+        ffmpeg_data["ffmpeg_hashs"],
+        True,
+        reverify=reverify,
     )
 
     if ffmpeg_download[0] is False:
@@ -427,20 +1263,44 @@ def cli(
 
     click.echo(click.style("Done", fg="green"))
     click.echo()
+    timer.mark("ffmpeg")
+
+    calibration = {}  # Tests without an entry start with a single worker
+    if calibrate:
+        click.echo(click.style("Calibrating:", bold=True))
+        calibration = calibrateTests(
+            server_data["tests"],
+            ffmpeg_binary,
+            supported_types,
+            gpus,
+            selected_gpus,
+            gpu_idx,
+        )
+        click.echo(click.style("Done", fg="green"))
+        click.echo()
+        timer.mark("calibration")
+
+    session_limits = {}  # Hard limit for the worker count of GPU tests, by GPU
+    if session_probe and selected_gpus:
+        for selected_gpu in selected_gpus:
+            session_limits[selected_gpu] = sessionLimit(
+                server_data["tests"],
+                ffmpeg_binary,
+                gpus[selected_gpu],
+                selected_gpu,
+                cache_dir,
+            )
+        timer.mark("session probe")
 
     # Downloading Videos
     files = server_data["tests"]
     click.echo(click.style("Obtaining Test-Files:", bold=True))
-    for file in files:
-        name = os.path.basename(file["name"])
-        click.echo(f'| "{name}" -', nl=False)
-        success, output = obtainSource(
-            video_path, file["source_url"], file["source_hashs"], False
-        )
-        if success:
-            click.echo(" success!")
-        else:
-            click.echo(" Error")
+    if pipeline:  # Downloads run in the background, once the benchmark started
+        verifySources(files, video_path, reverify)
+        click.echo("| Remaining files are downloaded during the benchmark")
+    else:
+        success, output = fetchSources(files, video_path, download_jobs, reverify)
+        if not success:
             click.echo("")
             click.echo(f"The following Error occured: {output}", err=True)
             click.pause("Press any key to exit")
@@ -457,68 +1317,220 @@ def cli(
                 commands = test["arguments"]
                 for command in commands:
                     if command["type"] in supported_types:
-                        test_arg_count += 1
+                        test_arg_count += len(
+                            gpuSelections(
+                                command["type"], gpus, selected_gpus, gpu_mode
+                            )
+                        )
         click.echo(f"We will do {test_arg_count} tests.")
 
+    timer.mark("test files")
     if not click.confirm("Do you want to continue?"):
         click.echo("Exiting...")
         exit()
+    timer.mark("confirmation")
 
+    run_config = {
+        "scaling": scaling,
+        "engine": engine,
+        "placement": placement,
+        "sample_rate": sample_rate,
+        "thermal_limit": thermal_limit,
+        "cooldown": cooldown,
+        "steady_state": steady_state,
+        "abort_speed": 1.0 if early_abort else None,
+    }
     benchmark_data = []
+    journal_file = journal.journal_path(output_path)
+    if resume:  # Tests completed by an earlier (interrupted) run
+        completed = journal.read_journal(journal_file)
+        click.echo(f"Resuming: {len(completed)} tests already done.")
+    else:
+        completed = {}
+        journal.reset_journal(journal_file)
+    if cache_ttl > 0:  # Identifies this machine and ffmpeg build in the cache keys
+        hardware = cache.hardware_fingerprint(system_info, hwi.get_driver_versions())
+        ffmpeg_checksum = verified_sha256(ffmpeg_binary, reverify)
     click.echo()
 
-    with click.progressbar(
+    results_lock = threading.Lock()  # Journal / cache writes of parallel GPU tests
+
+    def run_test(test: dict, command: dict, selected_gpu, status) -> dict:
+        # Benchmark (or reuse) one test on one device selection, reads the
+        # per file state (current_file, input_file, ...) of the loop below
+        # status: progressbar (or TestStatus) the benchmark reports to
+        done_key = journal.test_key(
+            {"id": test["id"], "type": command["type"], "selected_gpu": selected_gpu}
+        )
+        if done_key in completed:
+            return completed[done_key]
+        if command["type"] == "cpu":
+            gpu_ids = [gpu_idx]
+        elif isinstance(selected_gpu, list):  # Aggregate, workers over all GPUs
+            gpu_ids = selected_gpu
+        else:
+            gpu_ids = [selected_gpu]
+        arguments = [
+            command["args"].format(video_file=current_file, gpu=gpu) for gpu in gpu_ids
+        ]
+        test_cmds = [
+            f"{ffmpeg_binary} " + command["args"].format(video_file=input_file, gpu=gpu)
+            for gpu in gpu_ids
+        ]
+        test_config = run_config
+        if command["type"] != "cpu":  # Only CPU workers are pinned
+            limits = [session_limits.get(gpu) for gpu in gpu_ids]
+            test_config = {
+                **run_config,
+                "placement": "none",
+                "cpu_clocks": False,
+                "max_workers": None if None in limits else sum(limits),
+            }
+        # Workers are spread over all GPUs of a selection, so are their estimates
+        calibration_keys = [
+            (test["id"], command["type"], None if command["type"] == "cpu" else gpu)
+            for gpu in gpu_ids
+        ]
+        if all(key in calibration for key in calibration_keys):
+            test_config = {
+                **test_config,
+                "start_workers": sum(calibration[key] for key in calibration_keys),
+            }
+
+        cached = None
+        if cache_ttl > 0:
+            key = cache.cache_key(
+                ffmpeg_checksum,
+                video_checksum,
+                arguments[0] if len(arguments) == 1 else arguments,
+                hardware,
+                test_config,
+            )
+            cached = cache.read_cache(cache_dir, key, cache_ttl * 86400)
+        if cached is not None:
+            if debug_flag:
+                click.echo("> > > > Using cached result")
+            runs, result = cached["runs"], cached["results"]
+        else:
+            valid, runs, result = benchmark(
+                test_cmds[0] if len(test_cmds) == 1 else test_cmds,
+                debug_flag,
+                status,
+                test_config,
+                source_duration,
+            )
+
+        test_data = {}
+        test_data["id"] = test["id"]
+        test_data["type"] = command["type"]
+        if command["type"] != "cpu":
+            test_data["selected_gpu"] = selected_gpu
+            test_data["selected_cpu"] = None
+        else:
+            test_data["selected_gpu"] = None
+            test_data["selected_cpu"] = 0
+        test_data["runs"] = runs
+        test_data["results"] = result
+        with results_lock:
+            if cached is not None:
+                test_data["cached"] = True
+            elif cache_ttl > 0 and len(runs) >= 1:
+                cache.write_cache(cache_dir, key, test_data, cache_size * 1024**2)
+            journal.append_journal(journal_file, test_data)
+        return test_data
+
+    if pipeline:
+        downloads = SourcePipeline(
+            files, video_path, download_jobs, download_limit * 1024**2
+        )
+    else:
+        downloads = contextlib.nullcontext()
+
+    with downloads, click.progressbar(
         length=test_arg_count, label="Starting Benchmark..."
     ) as prog_bar:
-        for file in files:  # File Benchmarking Loop
+        for file_idx, file in enumerate(files):  # File Benchmarking Loop
             if debug_flag:
                 click.echo()
                 click.echo(f"| Current File: {file['name']}")
+            if pipeline:
+                success, output = downloads.wait(file_idx)
+                if not success:
+                    click.echo("")
+                    click.echo(
+                        f'The following Error occured: "{file["name"]}": {output}',
+                        err=True,
+                    )
+                    click.pause("Press any key to exit")
+                    exit()
             filename = os.path.basename(file["source_url"])
             current_file = f"{video_path}/{filename}"
+            source_duration = worker.probe_duration(ffmpeg_binary, current_file)
+            if cache_ttl > 0:
+                _, video_checksum = match_hash(file["source_hashs"], False)
+                video_checksum = video_checksum or verified_sha256(current_file)
             tests = file["data"]
-            for test in tests:
-                if debug_flag:
-                    click.echo(
-                        f"> > Current Test: {test['from_resolution']} - {test['to_resolution']}"
-                    )
-                commands = test["arguments"]
-                for command in commands:
-                    test_data = {}
-                    if command["type"] in supported_types:
+            staged, input_file = False, current_file
+            if stage != "none":  # Keep storage bandwidth out of the measurement
+                staged, staged_output = staging.stage_file(
+                    current_file, stage, stage_budget
+                )
+                if staged:
+                    input_file = staged_output
+                    if debug_flag:
+                        click.echo(f"| Staged in RAM: {input_file}")
+                else:
+                    click.echo(f"Note: {filename} not staged: {staged_output}")
+            try:
+                for test in tests:
+                    if debug_flag:
+                        click.echo(
+                            f"> > Current Test: {test['from_resolution']} - {test['to_resolution']}"
+                        )
+                    commands = test["arguments"]
+                    for command in commands:
+                        if command["type"] not in supported_types:
+                            continue
                         if debug_flag:
                             click.echo(f"> > > Current Device: {command['type']}")
-                        arguments = command["args"]
-                        arguments = arguments.format(
-                            video_file=current_file, gpu=gpu_idx
+                        selections = gpuSelections(
+                            command["type"], gpus, selected_gpus, gpu_mode
                         )
-                        test_cmd = f"{ffmpeg_binary} {arguments}"
-
-                        valid, runs, result = benchmark(test_cmd, debug_flag, prog_bar)
-                        if not debug_flag:
-                            prog_bar.update(1)
-
-                        test_data["id"] = test["id"]
-                        test_data["type"] = command["type"]
-                        if command["type"] != "cpu":
-                            test_data["selected_gpu"] = gpu_idx
-                            test_data["selected_cpu"] = None
+                        if len(selections) > 1:  # One isolated worker pool per GPU
+                            results = runParallel(
+                                functools.partial(run_test, test, command),
+                                selections,
+                                prog_bar,
+                                not debug_flag,
+                            )
                         else:
-                            test_data["selected_gpu"] = None
-                            test_data["selected_cpu"] = 0
-                        test_data["runs"] = runs
-                        test_data["results"] = result
-
-                        if len(runs) >= 1:
-                            benchmark_data.append(test_data)
+                            results = [run_test(test, command, selections[0], prog_bar)]
+                        for test_data in results:
+                            if not debug_flag:
+                                prog_bar.update(1)
+                            if len(test_data["runs"]) >= 1:
+                                benchmark_data.append(test_data)
+            finally:
+                if staged:
+                    staging.release_file(input_file, stage)
     click.echo("")  # Displaying Prompt, before attempting to output / build final dict
     click.echo("Benchmark Done. Writing file to Output.")
+    timer.mark("benchmark")
     result_data = {
         "token": server_data["token"],
-        "hwinfo": {"ffmpeg": ffmpeg_data, **system_info},
+        "hwinfo": {
+            "ffmpeg": ffmpeg_data,
+            **system_info,
+            "topology": topology,
+            "encoder_sessions": session_limits,
+        },
         "tests": benchmark_data,
     }
     output_json(result_data, output_path)
+    timer.mark("output")
+    if timings:
+        click.echo()
+        timer.report()
 
 
 def main():
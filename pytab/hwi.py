@@ -17,20 +17,28 @@
 #    along with this program.  If not, see <https://www.gnu.org/licenses/>.
 #
 ##########################################################################################
+import concurrent.futures
+import glob
+import os
 import platform
 import subprocess
-from json import dumps, loads
+from json import JSONDecodeError, dump, dumps, load, loads
 
 import click
-import cpuinfo
 
-if platform.system() == "Windows":
-    import wmi
+BOOT_ID_PATH = "/proc/sys/kernel/random/boot_id"
+DRIVER_VERSION_GLOB = "/sys/module/*/version"  # Out of tree modules (e.g. nvidia)
+DISPLAY_CLASS_KEY = (  # Windows device class of display adapters
+    r"SYSTEM\CurrentControlSet\Control\Class\{4d36e968-e325-11ce-bfc1-08002be10318}"
+)
 
 
-def run_lshw(hardware):
+def run_lshw(*hardware):
+    lshw_cmd = ["lshw", "-json"]
+    for hw_class in hardware:  # One lshw call for all classes
+        lshw_cmd += ["-class", hw_class]
     hw_subproc = subprocess.run(
-        ["lshw", "-json", "-class", hardware],
+        lshw_cmd,
         text=True,
         capture_output=True,
         stdin=subprocess.PIPE,
@@ -99,9 +107,11 @@ def get_os_info() -> dict:
     return os_element
 
 
-def get_gpu_info() -> list:
+def get_gpu_info(lshw_info: list = None) -> list:
     gpu_elements = list()
     if platform.system() == "Windows":
+        import wmi  # Windows only, loaded on use
+
         c = wmi.WMI()
         gpus = c.Win32_VideoController()
 
@@ -124,7 +134,9 @@ def get_gpu_info() -> list:
             gpu_elements.append(gpu_element)
 
     elif platform.system() == "Linux":
-        gpus_info = run_lshw("display")  # Display fetches info from lshw
+        if lshw_info is None:
+            lshw_info = run_lshw("display")  # Display fetches info from lshw
+        gpus_info = [gpu for gpu in lshw_info if gpu.get("class") == "display"]
         for gpu in gpus_info:
             if "vendor" not in gpu:
                 if "product" in gpu:
@@ -146,6 +158,8 @@ def get_gpu_info() -> list:
 
 
 def get_cpu_info() -> list:
+    import cpuinfo  # Slow to load, only needed for a hardware scan
+
     cpu_info = cpuinfo.get_cpu_info()
     cpu_elements = list()
     vendor = cpu_info["vendor_id_raw"]
@@ -167,9 +181,11 @@ def get_cpu_info() -> list:
     return cpu_elements
 
 
-def get_ram_info() -> list:
+def get_ram_info(lshw_info: list = None) -> list:
     ram_modules = list()
     if platform.system() == "Windows":
+        import wmi
+
         c = wmi.WMI()
         for ram in c.Win32_PhysicalMemory():
             capacity = int(ram.Capacity) // (1024**3)  # Convert bytes to gigabytes
@@ -187,8 +203,9 @@ def get_ram_info() -> list:
             }
             ram_modules.append(ram_module)
     elif platform.system() == "Linux":
-        memory_info = run_lshw("memory")
-        for memory in memory_info:
+        if lshw_info is None:
+            lshw_info = run_lshw("memory")
+        for memory in lshw_info:
             if memory["id"] == "memory" and "size" in memory and "units" in memory:
                 if memory["units"] == "bytes":
                     memory["units"] == "b"
@@ -202,13 +219,159 @@ def get_ram_info() -> list:
     return ram_modules
 
 
-def get_system_info() -> dict:
-    system_info = {
-        "os": get_os_info(),
-        "cpu": get_cpu_info(),
-        "memory": get_ram_info(),
-        "gpu": get_gpu_info(),
-    }
+def parse_cpulist(cpulist: str) -> list:
+    # "0-3,8" -> [0, 1, 2, 3, 8]
+    cpus = []
+    for part in cpulist.strip().split(","):
+        if "-" in part:
+            first, last = part.split("-")
+            cpus.extend(range(int(first), int(last) + 1))
+        elif part:
+            cpus.append(int(part))
+    return cpus
+
+
+def format_cpulist(cpus: list) -> str:
+    # [0, 1, 2, 3, 8] -> "0-3,8"
+    ranges = []
+    for cpu in sorted(cpus):
+        if ranges and cpu == ranges[-1][1] + 1:
+            ranges[-1][1] = cpu
+        else:
+            ranges.append([cpu, cpu])
+    return ",".join(
+        str(first) if first == last else f"{first}-{last}" for first, last in ranges
+    )
+
+
+def get_cpu_topology() -> dict:
+    # Usable CPUs and their NUMA nodes (a single node if unknown)
+    if hasattr(os, "sched_getaffinity"):
+        cpus = sorted(os.sched_getaffinity(0))
+    else:
+        cpus = list(range(os.cpu_count() or 1))
+    nodes = {}
+    for node_path in sorted(glob.glob("/sys/devices/system/node/node[0-9]*")):
+        try:
+            with open(os.path.join(node_path, "cpulist")) as f:
+                node_cpus = [cpu for cpu in parse_cpulist(f.read()) if cpu in cpus]
+        except OSError:
+            continue
+        if node_cpus:
+            nodes[int(os.path.basename(node_path)[4:])] = node_cpus
+    if not nodes:
+        nodes = {0: cpus}
+    return {"cpus": cpus, "nodes": nodes}
+
+
+def _probe(function, *args):
+    # WMI (COM) has to be initialized in every thread using it
+    if platform.system() != "Windows":
+        return function(*args)
+    import pythoncom
+
+    pythoncom.CoInitialize()
+    try:
+        return function(*args)
+    finally:
+        pythoncom.CoUninitialize()
+
+
+def get_boot_id() -> str:
+    # Unique per boot, None where the OS has no such id (the boot time is no
+    # substitute: Windows Fast Startup keeps it across shutdowns)
+    try:
+        with open(BOOT_ID_PATH) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def _windows_display_drivers() -> dict:
+    # DriverVersion of every display adapter, by PNP id (from the registry)
+    import winreg
+
+    versions = {}
+    try:
+        class_key = winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, DISPLAY_CLASS_KEY)
+    except OSError:
+        return versions
+    with class_key:
+        for idx in range(winreg.QueryInfoKey(class_key)[0]):
+            name = winreg.EnumKey(class_key, idx)
+            try:
+                with winreg.OpenKey(class_key, name) as adapter_key:
+                    pnp_id = winreg.QueryValueEx(adapter_key, "MatchingDeviceId")[0]
+                    version = winreg.QueryValueEx(adapter_key, "DriverVersion")[0]
+            except OSError:  # "Properties" and other non adapter subkeys
+                continue
+            versions[f"{name}:{pnp_id}"] = version
+    return versions
+
+
+def get_driver_versions() -> dict:
+    # Kernel release covers in tree drivers, out of tree modules report their own
+    # On Windows the display adapters with their driver versions
+    versions = {"kernel": platform.release()}
+    if platform.system() == "Windows":
+        versions.update(_windows_display_drivers())
+    for version_path in glob.glob(DRIVER_VERSION_GLOB):
+        try:
+            with open(version_path) as f:
+                versions[version_path.split("/")[-2]] = f.read().strip()
+        except OSError:
+            continue
+    return versions
+
+
+def _read_hwinfo_cache(cache_path: str, cache_key: dict) -> dict:
+    try:
+        with open(cache_path, "r") as f:
+            cached = load(f)
+    except (OSError, JSONDecodeError):
+        return None
+    if cached.get("key") != cache_key:  # Rebooted or drivers changed
+        return None
+    return cached["system_info"]
+
+
+def _write_hwinfo_cache(cache_path: str, cache_key: dict, system_info: dict) -> None:
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    with open(f"{cache_path}.tmp", "w") as f:
+        dump({"key": cache_key, "system_info": system_info}, f)
+    os.replace(f"{cache_path}.tmp", cache_path)
+
+
+def get_system_info(cache_path: str = None) -> dict:
+    # All probes run concurrently, results are reused until reboot / driver update
+    # Without a boot id a reboot (e.g. a swapped GPU) is not detectable, no cache
+    if cache_path and get_boot_id() is None:
+        cache_path = None
+    if cache_path:
+        cache_key = {"boot_id": get_boot_id(), "drivers": get_driver_versions()}
+        system_info = _read_hwinfo_cache(cache_path, cache_key)
+        if system_info is not None:
+            return system_info
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
+        os_future = executor.submit(_probe, get_os_info)
+        cpu_future = executor.submit(_probe, get_cpu_info)
+        if platform.system() == "Linux":
+            lshw_info = run_lshw("display", "memory")
+            memory_future = executor.submit(get_ram_info, lshw_info)
+            gpu_future = executor.submit(get_gpu_info, lshw_info)
+        else:
+            memory_future = executor.submit(_probe, get_ram_info)
+            gpu_future = executor.submit(_probe, get_gpu_info)
+        system_info = {
+            "os": os_future.result(),
+            "cpu": cpu_future.result(),
+            "memory": memory_future.result(),
+            "gpu": gpu_future.result(),
+        }
+
+    if cache_path:
+        _write_hwinfo_cache(cache_path, cache_key, system_info)
     return system_info
 
 
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+
+# pytab.journal.py
+# A transcoding hardware benchmarking client (for Jellyfin)
+#    Copyright (C) 2024 BotBlake <B0TBlake@protonmail.com>
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, version 3 of the License.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+##########################################################################################
+import os
+from json import JSONDecodeError, dumps, loads
+
+
+def journal_path(output_path: str) -> str:
+    # Journal lives next to the output file: output.json -> output.journal.jsonl
+    return f"{os.path.splitext(output_path)[0]}.journal.jsonl"
+
+
+def test_key(test_data: dict) -> tuple:
+    # Identifies one test of one device in the journal
+    selected_gpu = test_data["selected_gpu"]
+    if isinstance(selected_gpu, list):  # All GPUs at once (aggregate)
+        selected_gpu = tuple(selected_gpu)
+    return test_data["id"], test_data["type"], selected_gpu
+
+
+def read_journal(path: str) -> dict:
+    # Completed tests by test_key, a torn last line (crash) is ignored
+    entries = {}
+    try:
+        with open(path, "r") as file:
+            for line in file:
+                try:
+                    test_data = loads(line)
+                except JSONDecodeError:
+                    continue
+                entries[test_key(test_data)] = test_data
+    except FileNotFoundError:
+        pass
+    return entries
+
+
+def reset_journal(path: str) -> None:
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w"):
+        pass
+
+
+def append_journal(path: str, test_data: dict) -> None:
+    # One JSON line per completed test, on disk before the next test starts
+    with open(path, "a") as file:
+        file.write(dumps(test_data) + "\n")
+        file.flush()
+        os.fsync(file.fileno())
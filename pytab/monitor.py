@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+
+# pytab.monitor.py
+# A transcoding hardware benchmarking client (for Jellyfin)
+#    Copyright (C) 2024 BotBlake <B0TBlake@protonmail.com>
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, version 3 of the License.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+##########################################################################################
+import glob
+import os
+import threading
+import time
+from statistics import fmean
+
+PROC_AVAILABLE = os.path.exists("/proc/self/stat")  # Linux style procfs
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+THERMAL_GLOB = "/sys/class/thermal/thermal_zone*/temp"
+CPUFREQ_GLOB = "/sys/devices/system/cpu/cpu[0-9]*/cpufreq/scaling_cur_freq"
+THROTTLE_GLOB = "/sys/devices/system/cpu/cpu[0-9]*/thermal_throttle/*_throttle_count"
+
+
+def summarize(values: list) -> dict:
+    # mean / p95 / max of a series of samples
+    if not values:
+        return {"mean": 0, "p95": 0, "max": 0}
+    ordered = sorted(values)
+    return {
+        "mean": round(fmean(ordered), 2),
+        "p95": round(ordered[int(0.95 * (len(ordered) - 1))], 2),
+        "max": round(ordered[-1], 2),
+    }
+
+
+def read_process(pid: int) -> dict:
+    # CPU ticks, RSS, context switches and I/O of one process, None if it is gone
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rpartition(")")[2].split()  # comm may contain spaces
+        sample = {"cpu_ticks": int(fields[11]) + int(fields[12])}  # utime + stime
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key == "VmRSS":
+                    sample["rss_kb"] = int(value.split()[0])
+                elif key == "voluntary_ctxt_switches":
+                    sample["ctx_voluntary"] = int(value)
+                elif key == "nonvoluntary_ctxt_switches":
+                    sample["ctx_involuntary"] = int(value)
+    except (OSError, ValueError, IndexError):
+        return None
+    try:  # Only readable for our own processes
+        with open(f"/proc/{pid}/io") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key in ("rchar", "read_bytes", "write_bytes"):
+                    sample[key] = int(value)
+    except OSError:
+        pass
+    return sample
+
+
+def _read_values(paths: list) -> list:
+    values = []
+    for path in paths:
+        try:
+            with open(path) as f:
+                values.append(int(f.read()))
+        except (OSError, ValueError):
+            continue
+    return values
+
+
+class ResourceSampler:
+    # Polls /proc for all workers of one round from a background thread
+    # together with the temperatures and CPU clocks of the host
+    # CPU clocks are only meaningful while the workers load the CPU, with
+    # cpu_clocks=False (GPU tests) they are not sampled at all. Clocks of the
+    # first settle seconds (ffmpeg start-up, single core boost) are skipped.
+    # Where the kernel counts throttle events, those decide instead of clocks
+    def __init__(
+        self,
+        get_pids,
+        rate: float,
+        thermal_limit: float = 90,
+        freq_drop: float = 0.15,
+        cpu_clocks: bool = True,
+        settle: float = 10,
+    ):
+        self._get_pids = get_pids  # Returns the pids of the running workers
+        self._interval = 1 / rate
+        self._thermal_limit = thermal_limit  # Degree Celsius
+        self._freq_drop = freq_drop  # Max. relative drop of the CPU clock
+        self._last = {}  # pid: (time, sample)
+        self._cpu_percent = []  # Summed over all workers, per poll
+        self._rss_kb = []
+        self._thermal_paths = glob.glob(THERMAL_GLOB)
+        self._cpufreq_paths = glob.glob(CPUFREQ_GLOB) if cpu_clocks else []
+        self._throttle_paths = glob.glob(THROTTLE_GLOB) if cpu_clocks else []
+        self._throttle_start = None  # Summed throttle counts at start
+        self._settle = settle
+        self._loaded_at = None  # First poll with running workers
+        self._temp_c = []  # Hottest zone, per poll
+        self._freq_mhz = []  # Fastest CPU, per poll
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self) -> None:
+        if self._throttle_paths:
+            self._throttle_start = sum(_read_values(self._throttle_paths))
+        self._thread.start()
+
+    def stop(self) -> dict:
+        self._stop.set()
+        self._thread.join()
+        return self.summary()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self._interval):
+            self.poll()
+
+    def poll(self) -> None:
+        cpu_percent = 0.0
+        rss_kb = 0
+        seen = False
+        for pid in self._get_pids():
+            now = time.monotonic()
+            sample = read_process(pid)
+            if sample is None:
+                continue
+            seen = True
+            if pid in self._last:
+                last_time, last_sample = self._last[pid]
+                ticks = sample["cpu_ticks"] - last_sample["cpu_ticks"]
+                cpu_percent += 100 * ticks / CLOCK_TICKS / (now - last_time)
+            rss_kb += sample.get("rss_kb", 0)
+            self._last[pid] = (now, sample)
+        if not seen:  # Idle host (round not started or over), nothing to compare
+            return
+        self._cpu_percent.append(cpu_percent)
+        self._rss_kb.append(rss_kb)
+
+        temperatures = _read_values(self._thermal_paths)  # millidegree Celsius
+        if temperatures:
+            self._temp_c.append(max(temperatures) / 1000)
+        if self._loaded_at is None:
+            self._loaded_at = time.monotonic()
+        if time.monotonic() - self._loaded_at < self._settle:
+            return  # Clocks still include the start-up boost
+        frequencies = _read_values(self._cpufreq_paths)  # kHz
+        if frequencies:
+            self._freq_mhz.append(max(frequencies) / 1000)
+
+    def thermal(self) -> dict:
+        # Whether the round ran hot, was throttled or ran with dropping CPU clocks
+        throttle_events = None
+        if self._throttle_start is not None:
+            throttle_events = sum(_read_values(self._throttle_paths))
+            throttle_events -= self._throttle_start
+        if not self._temp_c and not self._freq_mhz and throttle_events is None:
+            return None
+        max_temp = max(self._temp_c, default=0)
+        freq_drop = 0.0
+        if self._freq_mhz and max(self._freq_mhz) > 0:
+            freq_drop = 1 - min(self._freq_mhz) / max(self._freq_mhz)
+        if throttle_events is None:
+            throttled = freq_drop > self._freq_drop
+        else:  # The kernel knows, clocks may also drop for other reasons
+            throttled = throttle_events > 0
+        thermal = {
+            "max_temp_c": max_temp,
+            "freq_mhz": summarize(self._freq_mhz),
+            "freq_drop": round(freq_drop, 3),
+            "throttled": max_temp >= self._thermal_limit or throttled,
+        }
+        if throttle_events is not None:
+            thermal["throttle_events"] = throttle_events
+        return thermal
+
+    def summary(self) -> dict:
+        # Compact per run summary, counters are the last values seen per worker
+        totals = {}
+        for _, sample in self._last.values():
+            for key in (
+                "ctx_voluntary",
+                "ctx_involuntary",
+                "rchar",
+                "read_bytes",
+                "write_bytes",
+            ):
+                totals[key] = totals.get(key, 0) + sample.get(key, 0)
+        summary = {
+            "samples": len(self._rss_kb),
+            "cpu_percent": summarize(self._cpu_percent[1:]),  # First has no delta
+            "rss_kb": summarize(self._rss_kb),
+            **totals,
+        }
+        thermal = self.thermal()
+        if thermal:
+            summary["thermal"] = thermal
+        return summary
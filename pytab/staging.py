@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+
+# pytab.staging.py
+# A transcoding hardware benchmarking client (for Jellyfin)
+#    Copyright (C) 2024 BotBlake <B0TBlake@protonmail.com>
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, version 3 of the License.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+##########################################################################################
+import os
+from shutil import copyfile
+
+TMPFS_PATH = "/dev/shm"
+RAM_SHARE = 0.5  # Max. share of the RAM a staged video may occupy
+CHUNK_SIZE = 1024 * 1024
+
+UNIT_BYTES = {
+    "bytes": 1,
+    "b": 1,
+    "kilobytes": 1024,
+    "kb": 1024,
+    "megabytes": 1024**2,
+    "mb": 1024**2,
+    "gigabytes": 1024**3,
+    "gb": 1024**3,
+}
+
+
+def supported_modes() -> list:
+    modes = ["none"]
+    if os.path.isdir(TMPFS_PATH):
+        modes.append("tmpfs")
+    if hasattr(os, "posix_fadvise"):
+        modes.append("pagecache")
+    return modes
+
+
+def ram_bytes(memory_info: list) -> int:
+    # Total RAM reported by hwi.get_ram_info
+    total = 0
+    for memory in memory_info:
+        total += int(memory.get("size", 0)) * UNIT_BYTES.get(memory.get("units"), 1)
+    return total
+
+
+def available_bytes() -> int:
+    # Memory the kernel could hand out right now, None if unknown
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def memory_budget(memory_info: list) -> int:
+    budget = int(ram_bytes(memory_info) * RAM_SHARE)
+    available = available_bytes()
+    if available is not None:
+        budget = min(budget, available) if budget else available
+    return budget
+
+
+def _fadvise(file_path: str, advice: int) -> None:
+    fd = os.open(file_path, os.O_RDONLY)
+    try:
+        os.posix_fadvise(fd, 0, 0, advice)
+        if advice == os.POSIX_FADV_WILLNEED:  # Only a hint, reading makes it stick
+            while os.read(fd, CHUNK_SIZE):
+                pass
+    finally:
+        os.close(fd)
+
+
+def stage_file(file_path: str, mode: str, budget: int) -> tuple:
+    # Makes the video readable from RAM, returns (True, path) or (False, reason)
+    size = os.path.getsize(file_path)
+    if size > budget:
+        return (
+            False,
+            f"{size // 1024**2} MiB exceed the budget of {budget // 1024**2} MiB",
+        )
+    if mode == "tmpfs":
+        staged_path = os.path.join(
+            TMPFS_PATH, f"pytab_{os.getpid()}_{os.path.basename(file_path)}"
+        )
+        try:
+            copyfile(file_path, staged_path)
+        except OSError as e:
+            if os.path.exists(staged_path):
+                os.remove(staged_path)
+            return False, str(e)
+        return True, staged_path
+    _fadvise(file_path, os.POSIX_FADV_WILLNEED)
+    return True, file_path
+
+
+def release_file(staged_path: str, mode: str) -> None:
+    # Frees the memory taken by stage_file
+    if mode == "tmpfs":
+        os.remove(staged_path)
+    elif mode == "pagecache":
+        _fadvise(staged_path, os.POSIX_FADV_DONTNEED)
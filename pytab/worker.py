@@ -19,121 +19,781 @@
 ##########################################################################################
 
 import concurrent.futures
+import os
 import re
+import shutil
 import subprocess
+import threading
+import time
+from collections import deque
+from statistics import fmean, pstdev
 
 import click
 
+from pytab import hwi, monitor
 
-def run_ffmpeg(pid: int, ffmpeg_cmd: list) -> tuple:  # Process ID,
-    # click.echo(f"{pid} |> Running FFMPEG Process: {pid}")
-    timeout = 120  # Stop any process that runs for more then 120sec
-    failure_reason = None
+WARMUP_FRAMES = 500  # Progress before this frame is discarded (encoder warm-up)
+PROGRESS_ARGS = ["-progress", "pipe:2", "-nostats"]  # key=value progress on stderr
+STOP_GRACE = 5  # Seconds a gracefully stopped worker gets before it is killed
+TIMEOUT_STARTUP = 15  # Seconds added to every computed timeout (ffmpeg/device init)
+TIMEOUT_MARGIN = 0.5  # Fraction of the expected speed a run may drop to
+ABORT_MARGIN = 0.8  # Abort when live speed is below this fraction of abort_speed
+MIN_WINDOW = 2  # Seconds all workers must run concurrently to measure the window
+START_TIMEOUT = 60  # Seconds workers wait for their siblings before starting
+DURATION_RE = re.compile(r"Duration: (\d+):(\d+):(\d+(?:\.\d+)?)")
+
+DEFAULT_RUN_CONFIG = {
+    "scaling": "walk",  # Worker scaling search in core.benchmark
+    "engine": "thread",  # Runs workers in threads or in one asyncio event loop
+    "placement": "none",  # Pin workers to CPU cores ("none", "cores", "numa")
+    "sample_rate": 2.0,  # Resource samples per second (0 to disable)
+    "thermal_limit": 90,  # Rounds reaching this temperature (C) count as throttled
+    "freq_drop": 0.15,  # Rounds with CPU clocks dropping more count as throttled
+    "cpu_clocks": True,  # Watch CPU clocks for throttling (off for GPU tests)
+    "cooldown": 0,  # Seconds to pause after a throttled round
+    "steady_state": False,  # Stop a round once every worker reports a stable speed
+    "steady_window": 10,  # Progress blocks (~0.5s each) checked for stability
+    "steady_tolerance": 0.02,  # Max. relative std. deviation of block speeds
+    "timeout": 120,  # Per worker timeout, if none can be derived from the source
+    "abort_speed": 1.0,  # Stop rounds projected below this speed (None to disable)
+    "abort_grace": 10,  # Seconds of progress before a round may be aborted
+    "start_workers": 1,  # First worker count tried (see calibrate)
+    "max_workers": None,  # Hard limit, e.g. encoder sessions (None: unlimited)
+}
+
+
+def _to_float(value: str) -> float:
+    # Strip ffmpeg units ("1.23x", "12.5s", "12345KiB"), None for "N/A"
+    try:
+        return float(value.rstrip("xsKkiB"))
+    except ValueError:
+        return None
+
+
+class WorkerStats:
+    # Compact accumulator fed line by line with the output of one ffmpeg worker
+    __slots__ = (
+        "frame",
+        "fps",
+        "speed",
+        "max_frame",
+        "samples",
+        "speed_sum",
+        "fps_sum",
+        "rss_kb",
+        "rtime",
+        "window",
+        "out_time",
+        "warm_at",
+        "timeline",
+    )
+
+    def __init__(self, window_size: int = DEFAULT_RUN_CONFIG["steady_window"]):
+        self.frame = 0  # Values of the current progress block
+        self.fps = 0.0
+        self.speed = None  # Live speed, None until ffmpeg reports one
+        self.max_frame = 0
+        self.samples = 0  # Progress blocks counted (after warm-up)
+        self.speed_sum = 0.0
+        self.fps_sum = 0.0
+        self.rss_kb = 0.0
+        self.rtime = 0.0
+        # Latest (time, out_time) blocks after warm-up, window_size rates apart
+        self.window = deque(maxlen=window_size + 1)
+        self.out_time = 0.0  # Seconds of output written
+        self.warm_at = None  # Time the warm-up was passed
+        self.timeline = []  # (time, out_time, frame) for every progress block
+
+    def feed(self, line: str) -> None:
+        if line.startswith("bench: "):  # -benchmark summary at exit
+            for field in line[7:].split():
+                key, _, value = field.partition("=")
+                if key == "maxrss":
+                    self.rss_kb = _to_float(value) or 0.0
+                elif key == "rtime":
+                    self.rtime = _to_float(value) or 0.0
+            return
+
+        key, _, value = line.partition("=")
+        if key == "frame":
+            self.frame = int(value) if value.isdigit() else self.frame
+        elif key == "fps":
+            self.fps = _to_float(value) or 0.0
+        elif key == "out_time_us":
+            self.out_time = int(value) / 1e6 if value.isdigit() else self.out_time
+        elif key == "speed":
+            speed = _to_float(value)
+            if speed is not None:
+                self.speed = speed
+        elif key == "progress":  # End of one progress block
+            now = time.monotonic()
+            self.timeline.append((now, self.out_time, self.frame))
+            if self.frame >= WARMUP_FRAMES and self.warm_at is None:
+                self.warm_at = now
+            if self.frame >= WARMUP_FRAMES and self.speed is not None:
+                self.samples += 1
+                self.speed_sum += self.speed
+                self.fps_sum += self.fps
+                self.max_frame = max(self.max_frame, self.frame)
+                self.window.append((now, self.out_time))
+
+    def block_rates(self) -> list:
+        # Speed of every progress block in the window (output seconds per second)
+        # ffmpeg's speed= is an average since the start and smooths itself out
+        blocks = list(self.window)
+        return [
+            (out_time - last_out_time) / (now - last_now)
+            for (last_now, last_out_time), (now, out_time) in zip(blocks, blocks[1:])
+            if now > last_now
+        ]
+
+    def window_speed(self) -> float:
+        # Speed over the whole window, None before it holds two blocks
+        if len(self.window) < 2 or self.window[-1][0] <= self.window[0][0]:
+            return None
+        (start, start_out_time), (end, end_out_time) = self.window[0], self.window[-1]
+        return (end_out_time - start_out_time) / (end - start)
+
+    def converged(self, tolerance: float) -> bool:
+        # Block speeds did not vary by more than tolerance over a full window
+        if len(self.window) < self.window.maxlen:
+            return False
+        rates = self.block_rates()
+        if len(rates) < 2:
+            return False
+        mean = fmean(rates)
+        return mean > 0 and pstdev(rates, mean) / mean <= tolerance
+
+    def live_speed(self) -> float:
+        # Speed over the latest progress blocks (also during warm-up), None
+        # before there are two. Unlike ffmpeg's speed= it excludes the start-up
+        blocks = self.timeline[-self.window.maxlen :]
+        if len(blocks) < 2 or blocks[-1][0] <= blocks[0][0]:
+            return None
+        return (blocks[-1][1] - blocks[0][1]) / (blocks[-1][0] - blocks[0][0])
+
+    def window_rates(self, start: float, end: float) -> tuple:
+        # (speed, fps) between the first and last progress block in start - end
+        inside = [block for block in self.timeline if start <= block[0] <= end]
+        if len(inside) < 2 or inside[-1][0] <= inside[0][0]:
+            return None
+        duration = inside[-1][0] - inside[0][0]
+        speed = (inside[-1][1] - inside[0][1]) / duration
+        fps = (inside[-1][2] - inside[0][2]) / duration
+        return speed, fps
+
+    def result(self, stop_reason: str = None, window: tuple = None) -> dict:
+        samples = self.samples or 1
+        speed = self.speed_sum / samples
+        fps = self.fps_sum / samples
+        rates = self.window_rates(*window) if window else None
+        if rates:
+            speed, fps = rates  # Measured while all workers were running
+        elif stop_reason == "steady_state" and self.window_speed() is not None:
+            speed = self.window_speed()  # Steady-state speed instead of lifetime avg
+        elif stop_reason == "low_speed" and not self.samples:
+            speed = self.live_speed() or 0.0  # Aborted during warm-up
+        return {
+            "frame": self.max_frame or 1,
+            "speed": speed,
+            "time_s": self.rtime,
+            "rss": self.rss_kb,
+            "FPS": fps,
+        }
+
+
+def concurrency_window(worker_stats: list) -> tuple:
+    # Interval in which all workers were past warm-up and still running
+    if not all(stats.warm_at for stats in worker_stats):
+        return None
+    start = max(stats.warm_at for stats in worker_stats)
+    end = min(stats.timeline[-1][0] for stats in worker_stats)
+    if end - start < MIN_WINDOW:
+        return None
+    return start, end
+
+
+class RoundControl:
+    # Shared by all workers of one workMan round to start them together
+    # and to stop every sibling at once
+    def __init__(self, worker_count: int = 1):
+        self.start_barrier = threading.Barrier(worker_count)
+        self.stopped = threading.Event()
+        self.reason = None  # Why the round was stopped
+        self.failed = False  # Stopped because of a failure (not a finished measurement)
+        self._processes = {}
+        self._lock = threading.Lock()
+
+    def register(self, pid: int, process) -> None:
+        with self._lock:
+            self._processes[pid] = process
+            if self.stopped.is_set():  # Round ended before this worker started
+                process.kill()
+
+    def pids(self) -> list:
+        with self._lock:
+            return [
+                process.pid
+                for process in self._processes.values()
+                if process.returncode is None
+            ]
+
+    def stop(self, reason: str, failed: bool = True) -> None:
+        # Failures kill all workers, otherwise they may exit gracefully (SIGTERM)
+        with self._lock:
+            if self.stopped.is_set():
+                return
+            self.reason = reason
+            self.failed = failed
+            self.stopped.set()
+            self.start_barrier.abort()  # Release workers still waiting to start
+            processes = list(self._processes.values())
+        for process in processes:
+            if process.returncode is None:
+                if failed:
+                    process.kill()
+                else:
+                    process.terminate()
+        if not failed:
+            timer = threading.Timer(STOP_GRACE, self._kill, [processes])
+            timer.daemon = True
+            timer.start()
+
+    @staticmethod
+    def _kill(processes: list) -> None:
+        for process in processes:
+            if process.returncode is None:
+                process.kill()
+
+
+def probe_duration(ffmpeg_binary: str, video_file: str) -> float:
+    # Duration of video_file in seconds (from the ffmpeg input summary)
     try:
         process_output = subprocess.run(
-            ffmpeg_cmd,
-            stdin=subprocess.PIPE,
+            [ffmpeg_binary, "-hide_banner", "-i", video_file],
+            stdin=subprocess.DEVNULL,
+            capture_output=True,
+            universal_newlines=True,
+            errors="replace",
+            timeout=30,
+        )
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    match = DURATION_RE.search(process_output.stderr)
+    if not match:
+        return None
+    hours, minutes, seconds = match.groups()
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+
+def round_timeout(
+    source_duration: float, last_run: dict, worker_count: int, config: dict
+) -> float:
+    # Per worker timeout for a round of worker_count workers
+    # Passing runs (speed >= abort_speed) never need more than duration / speed
+    if not source_duration:
+        return config["timeout"]
+    min_speed = config["abort_speed"] or 1.0
+    timeout = source_duration / min_speed
+    if last_run:  # Expected speed: last round's throughput shared by all workers
+        expected_speed = last_run["workers"] * last_run["speed"] / worker_count
+        timeout = min(timeout, source_duration / (expected_speed * TIMEOUT_MARGIN))
+    return timeout + TIMEOUT_STARTUP
+
+
+def _split_cpus(cpus: list, count: int) -> list:
+    # Split cpus into count contiguous sets, share single cpus if too few
+    if count > len(cpus):
+        return [[cpus[nr % len(cpus)]] for nr in range(count)]
+    size, extra = divmod(len(cpus), count)
+    cpu_sets = []
+    start = 0
+    for nr in range(count):
+        end = start + size + (1 if nr < extra else 0)
+        cpu_sets.append(cpus[start:end])
+        start = end
+    return cpu_sets
+
+
+def plan_placement(worker_count: int, placement: str) -> list:
+    # CPU set for every worker, None when workers run unpinned
+    if placement == "none" or not pinning_supported():
+        return None
+    topology = hwi.get_cpu_topology()
+    if placement == "cores":
+        return _split_cpus(topology["cpus"], worker_count)
+
+    # numa: spread workers over the nodes, each worker stays inside its node
+    nodes = list(topology["nodes"].values())
+    node_workers = [
+        list(range(nr, worker_count, len(nodes))) for nr in range(len(nodes))
+    ]
+    cpu_sets = [None] * worker_count
+    for node_cpus, workers in zip(nodes, node_workers):
+        if workers:
+            for nr, cpu_set in zip(workers, _split_cpus(node_cpus, len(workers))):
+                cpu_sets[nr] = cpu_set
+    return cpu_sets
+
+
+def pinning_supported() -> bool:
+    return hasattr(os, "sched_setaffinity") and shutil.which("taskset") is not None
+
+
+def pinned_cmd(ffmpeg_cmd: list, cpus: list) -> list:
+    # Start ffmpeg through taskset, all its threads inherit the affinity
+    # (a preexec_fn is not safe while other threads spawn processes)
+    if not cpus:
+        return ffmpeg_cmd
+    return ["taskset", "-c", hwi.format_cpulist(cpus)] + ffmpeg_cmd
+
+
+CALIBRATION_SECONDS = 3  # Length of the synthetic calibration input
+CALIBRATION_MARGIN = 0.75  # Synthetic input is easier to transcode than real video
+CALIBRATION_RESOLUTIONS = {
+    "2160p": "3840x2160",
+    "1440p": "2560x1440",
+    "1080p": "1920x1080",
+    "720p": "1280x720",
+    "480p": "854x480",
+}
+SESSION_PROBE_SESSIONS = 32  # Concurrent sessions opened by the limit probe
+SESSION_PROBE_SIZE = "320x240"
+SESSION_PROBE_SECONDS = 2
+DECODER_OPTIONS = (  # Input options that only apply to the real (encoded) input
+    "-c:v",
+    "-codec:v",
+    "-vcodec",
+    "-hwaccel",
+    "-hwaccel_device",
+    "-hwaccel_output_format",
+)
+FILTER_OPTIONS = ("-vf", "-filter:v", "-filter_complex")
+DEVICE_OPTIONS = ("-init_hw_device", "-filter_hw_device")
+UPLOAD_DEVICE = "pytab"  # Name of the device synthetic frames are uploaded to
+
+
+def _split_input(ffmpeg_cmd: str) -> tuple:
+    # (binary, options before the input, decoder options, options after the input)
+    ffmpeg_cmd_list = ffmpeg_cmd.split()
+    input_idx = ffmpeg_cmd_list.index("-i")
+    input_options = []
+    decoder = {}
+    options = iter(ffmpeg_cmd_list[1:input_idx])
+    for option in options:
+        if option in DECODER_OPTIONS:
+            decoder[option] = next(options, None)  # Drop the option and its value
+        else:
+            input_options.append(option)
+    return ffmpeg_cmd_list[0], input_options, decoder, ffmpeg_cmd_list[input_idx + 2 :]
+
+
+def _upload(input_options: list, decoder: dict) -> tuple:
+    # (device options, filter) putting software frames on the device the
+    # hardware decoder of the test would have decoded to
+    device_options = []
+    if "-init_hw_device" not in input_options and "-hwaccel" in decoder:
+        device = f"{decoder['-hwaccel']}={UPLOAD_DEVICE}"
+        if "-hwaccel_device" in decoder:
+            device += f":{decoder['-hwaccel_device']}"
+        device_options = ["-init_hw_device", device, "-filter_hw_device", UPLOAD_DEVICE]
+    upload = "hwupload"
+    if decoder.get("-hwaccel") == "qsv":
+        upload += "=extra_hw_frames=64"  # QSV encoders need a frame pool
+    return device_options, f"format=nv12,{upload}"
+
+
+def _with_filter(output_options: list, video_filter: str) -> list:
+    # output_options with video_filter in front of the video filter chain
+    output_options = list(output_options)
+    for idx, option in enumerate(output_options[:-1]):
+        if option in FILTER_OPTIONS:
+            output_options[idx + 1] = f"{video_filter},{output_options[idx + 1]}"
+            return output_options
+    return ["-vf", video_filter] + output_options
+
+
+def calibration_cmd(ffmpeg_cmd: str, size: str, duration: float) -> str:
+    # ffmpeg_cmd reading a lavfi test pattern instead of the test video
+    # Tests decoding to device frames get the pattern uploaded to that device
+    binary, input_options, decoder, output_options = _split_input(ffmpeg_cmd)
+    device_options = []
+    if "-hwaccel_output_format" in decoder:  # Filters expect hardware frames
+        device_options, upload = _upload(input_options, decoder)
+        output_options = _with_filter(output_options, upload)
+    source = f"testsrc2=size={size}:rate=30:duration={duration}"
+    return " ".join(
+        [binary]
+        + input_options
+        + device_options
+        + ["-f", "lavfi", "-i", source]
+        + output_options
+    )
+
+
+def session_probe_cmd(ffmpeg_cmd: str, size: str, duration: float) -> str:
+    # Only the encoder of ffmpeg_cmd, fed a realtime (-re) null pattern so the
+    # session stays open for the whole duration. The test's filters are left
+    # out, the pattern is uploaded to the test's device if it encodes from there
+    binary, input_options, decoder, output_options = _split_input(ffmpeg_cmd)
+    device_options = []
+    for idx, option in enumerate(input_options[:-1]):
+        if option in DEVICE_OPTIONS:
+            device_options += input_options[idx : idx + 2]
+    encoder_options = []
+    filters = []
+    options = iter(output_options)
+    for option in options:
+        if option in FILTER_OPTIONS:
+            filters.append(next(options, ""))
+        else:
+            encoder_options.append(option)
+    video_filter = "format=nv12"
+    if "-hwaccel_output_format" in decoder or any("hwupload" in f for f in filters):
+        upload_options, video_filter = _upload(device_options, decoder)
+        device_options += upload_options
+    source = f"nullsrc=size={size}:rate=30:duration={duration}"
+    return " ".join(
+        [binary]
+        + device_options
+        + ["-re", "-f", "lavfi", "-i", source, "-vf", video_filter]
+        + encoder_options
+    )
+
+
+def calibrate(ffmpeg_cmd: str, resolution: str, timeout: float = 60) -> tuple:
+    # Single stream speed on a synthetic input, (success, speed | error)
+    stats = WorkerStats()
+    try:
+        process_output = subprocess.run(
+            progress_cmd(
+                calibration_cmd(
+                    ffmpeg_cmd,
+                    CALIBRATION_RESOLUTIONS.get(resolution, "1920x1080"),
+                    CALIBRATION_SECONDS,
+                )
+            ),
+            stdin=subprocess.DEVNULL,
             capture_output=True,
             universal_newlines=True,
+            errors="replace",
             timeout=timeout,
         )
+    except (OSError, subprocess.TimeoutExpired) as e:
+        return False, str(e)
+    for line in process_output.stderr.splitlines():
+        stats.feed(line.strip())
+    if process_output.returncode != 0 or not stats.speed:
+        return False, f"ffmpeg exited with {process_output.returncode}"
+    return True, stats.speed
 
-        retcode = process_output.returncode
-        ffmpeg_stderr = process_output.stderr
 
-        if retcode > 0:
-            # click.echo(f"ERROR: {ffmpeg_stderr}")    <- Silencing Output
-            failure_reason = "generic_ffmpeg_failure"  # <-- HELP WANTED!
+def probe_session_limit(
+    ffmpeg_cmd: str, sessions: int = SESSION_PROBE_SESSIONS, timeout: float = 30
+) -> tuple:
+    # Hard encoder session limit (e.g. NVENC): runs sessions concurrent encodes
+    # of a tiny realtime input, the ones above the limit fail right away
+    # Returns (success, limit), limit is None if all sessions passed
+    probe_cmd = session_probe_cmd(
+        ffmpeg_cmd, SESSION_PROBE_SIZE, SESSION_PROBE_SECONDS
+    ).split()
+    processes = []
+    try:
+        for _ in range(sessions):
+            processes.append(
+                subprocess.Popen(
+                    probe_cmd,
+                    stdin=subprocess.DEVNULL,
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL,
+                )
+            )
+        deadline = time.monotonic() + timeout
+        passed = 0
+        for process in processes:
+            remaining = max(deadline - time.monotonic(), 0)
+            if process.wait(timeout=remaining) == 0:
+                passed += 1
+    except (OSError, subprocess.TimeoutExpired) as e:
+        return False, str(e)
+    finally:
+        for process in processes:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+    if passed == 0:  # Not even one session, the probe itself is broken
+        return False, "no session could be opened"
+    return True, None if passed == sessions else passed
 
-    except subprocess.TimeoutExpired:
-        ffmpeg_stderr = 1
-        failure_reason = "failed_timeout"
 
+def start_workers(speed: float) -> int:
+    # Worker count to start the scaling search with, for a calibrated speed
+    return max(1, int(speed * CALIBRATION_MARGIN))
+
+
+def progress_cmd(ffmpeg_cmd: str) -> list:
+    # Split the command and make ffmpeg report machine readable progress
+    ffmpeg_cmd_list = ffmpeg_cmd.split()
+    return ffmpeg_cmd_list[:1] + PROGRESS_ARGS + ffmpeg_cmd_list[1:]
+
+
+def run_ffmpeg(
+    pid: int,
+    ffmpeg_cmd: list,
+    stats: WorkerStats,
+    control: RoundControl,
+    timeout: float = 120,
+) -> tuple:  # Process ID,
+    # click.echo(f"{pid} |> Running FFMPEG Process: {pid}")
+    # timeout: Stop any process that runs for more then 120sec
+    failure_reason = None
+    try:  # Start together with all sibling workers
+        control.start_barrier.wait(START_TIMEOUT)
+    except threading.BrokenBarrierError:
+        pass  # Round stopped or a sibling did not show up, start anyway
+    try:
+        process = subprocess.Popen(
+            ffmpeg_cmd,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            universal_newlines=True,
+            errors="replace",
+        )
     except Exception as e:
         click.echo(e)
         exit(1)
+    control.register(pid, process)
+
+    timed_out = threading.Event()
+
+    def expire():
+        timed_out.set()
+        process.kill()
+
+    timer = threading.Timer(timeout, expire)
+    timer.start()
+    try:
+        for line in process.stderr:  # Parse progress while ffmpeg is running
+            stats.feed(line.strip())
+        retcode = process.wait()
+    finally:
+        timer.cancel()
+        process.stderr.close()
 
+    failure_reason = worker_failure(timed_out.is_set(), retcode, control)
     # click.echo(f"{pid} >| Ended FFMPEG Run: {pid}")
-    return ffmpeg_stderr, failure_reason
+    return stats, failure_reason
 
 
-def workMan(worker_count: int, ffmpeg_cmd: str) -> tuple:
-    ffmpeg_cmd_list = ffmpeg_cmd.split()
-    raw_worker_data = {}
+def worker_failure(timed_out: bool, retcode: int, control: RoundControl) -> str:
+    # Failure reason of an ended worker, a failure stops all its siblings
     failure_reason = None
-    # click.echo(f"> Run with {worker_count} Processes")
+    if timed_out:
+        failure_reason = "failed_timeout"
+    elif control.stopped.is_set() and retcode != 0:
+        if control.failed:
+            failure_reason = "cancelled"  # Killed because a sibling failed
+    elif retcode > 0:
+        # click.echo(f"ERROR: {ffmpeg_stderr}")    <- Silencing Output
+        failure_reason = "generic_ffmpeg_failure"  # <-- HELP WANTED!
+    if failure_reason:
+        control.stop(failure_reason)  # No-op if a sibling failed first
+    return failure_reason
+
+
+async def run_ffmpeg_async(
+    pid: int,
+    ffmpeg_cmd: list,
+    stats: WorkerStats,
+    control: RoundControl,
+    timeout: float = 120,
+) -> tuple:
+    # Same as run_ffmpeg, for the asyncio engine
+    import asyncio  # Imported on use, it is slow to load
+
+    try:
+        process = await asyncio.create_subprocess_exec(
+            *ffmpeg_cmd,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            limit=1024 * 1024,  # Max. line length
+        )
+    except Exception as e:
+        click.echo(e)
+        exit(1)
+    control.register(pid, process)
+
+    timed_out = False
+    try:
+        async with asyncio.timeout(timeout):
+            async for line in process.stderr:  # Parse progress while running
+                stats.feed(line.decode(errors="replace").strip())
+            retcode = await process.wait()
+    except TimeoutError:
+        timed_out = True
+    finally:
+        if process.returncode is None:  # Timed out or round cancelled
+            process.kill()
+            retcode = await asyncio.shield(process.wait())
+
+    failure_reason = worker_failure(timed_out, retcode, control)
+    return stats, failure_reason
+
+
+def check_round(worker_stats: list, config: dict, elapsed: float) -> str:
+    # Decide on live progress whether a running round can be stopped early
+    if config["steady_state"] and all(
+        stats.converged(config["steady_tolerance"]) for stats in worker_stats
+    ):
+        return "steady_state"
+    if config["abort_speed"] and elapsed >= config["abort_grace"]:
+        speeds = [stats.live_speed() for stats in worker_stats]
+        if None not in speeds and fmean(speeds) < config["abort_speed"] * ABORT_MARGIN:
+            return "low_speed"  # Round can not reach the required speed
+    return None
+
+
+def _run_round_threads(
+    worker_count: int,
+    worker_cmds: list,
+    worker_stats: list,
+    control: RoundControl,
+    config: dict,
+) -> None:
+    # One OS thread per ffmpeg process, monitored from the calling thread
     with concurrent.futures.ThreadPoolExecutor(max_workers=worker_count) as executor:
         futures = {
-            executor.submit(run_ffmpeg, nr, ffmpeg_cmd_list): nr
+            executor.submit(
+                run_ffmpeg,
+                nr,
+                worker_cmds[nr],
+                worker_stats[nr],
+                control,
+                config["timeout"],
+            ): nr
             for nr in range(worker_count)
         }
-        for future in concurrent.futures.as_completed(futures):
-            pid = futures[future]
-            try:
-                raw_worker_data[pid] = future.result()
-                # click.echo(f"> > > Finished Worker Process: {pid}")
-                if raw_worker_data[pid][1]:
-                    failure_reason = raw_worker_data[pid][1]
-            except Exception as e:
-                print(f"Worker {pid} generated an exception: {e}")
+        started = time.monotonic()
+        pending = set(futures)
+        while pending:
+            done, pending = concurrent.futures.wait(
+                pending, timeout=0.5, return_when=concurrent.futures.FIRST_COMPLETED
+            )
+            for future in done:
+                pid = futures[future]
+                try:
+                    future.result()
+                    # click.echo(f"> > > Finished Worker Process: {pid}")
+                except Exception as e:
+                    print(f"Worker {pid} generated an exception: {e}")
+                    control.stop("generic_ffmpeg_failure")
+            if pending and not control.stopped.is_set():
+                elapsed = time.monotonic() - started
+                stop_reason = check_round(worker_stats, config, elapsed)
+                if stop_reason:
+                    control.stop(stop_reason, failed=False)
 
-    if failure_reason:
-        raw_worker_data = None
-        # Deleting all the Raw Data, since run with failed Worker is not counted
-
-    run_data_raw = []
-    if raw_worker_data:  # If no run Failed
-        for pid in range(worker_count):
-            process_output = raw_worker_data[pid][0]
-
-            framelines = []
-            rtime = 0.0
-            for line in process_output.split("\n"):
-                if re.match(r"^frame=", line):
-                    if re.match(r"frame=\s*([5-9]\d{2,}|[1-9]\d{3,})", line):
-                        new_line = re.sub(r"=\s*", "=", line)
-                        framelines.append(new_line)  # framelines (Frame>500)
-
-                if re.match(r"^bench: maxrss", line):
-                    rssline = line.split()
-                    workrss = float(
-                        rssline[1].split("=")[-1].replace("kB", "")
-                    )  # maxrss
-
-                if re.match(r"^bench: utime", line):
-                    timeline = line.split()
-                    rtime = float(timeline[3].split("=")[-1].replace("s", ""))  # rtime
-
-            frames = []
-            speeds = []
-            framerates = 0
-            for line in framelines:
-                new_line = line.split()
-                frames.append(int(float(new_line[0].split("=")[-1])))
-                framerates += int(float(new_line[1].split("=")[-1]))
-                speeds.append(float(new_line[6].split("=")[-1].replace("x", "")))
-            lineAmmount = len(framelines)
-            if lineAmmount == 0:
-                lineAmmount = 1
-            if len(frames) == 0:
-                frames.append(1)
-
-            avgSpeed = sum(speeds) / lineAmmount
-            maxFrame = max(frames)
-            avgFPS = framerates / lineAmmount
-
-            worker_data = {
-                "frame": maxFrame,
-                "speed": avgSpeed,
-                "time_s": rtime,
-                "rss": workrss,
-                "FPS": avgFPS,
-            }
-
-            run_data_raw.append(worker_data)
-        return False, evaluateRunData(run_data_raw)
-    else:
-        return True, failure_reason
+
+async def _run_round_asyncio(
+    worker_count: int,
+    worker_cmds: list,
+    worker_stats: list,
+    control: RoundControl,
+    config: dict,
+) -> None:
+    # All ffmpeg processes driven from one event loop
+    import asyncio
+
+    tasks = [
+        asyncio.create_task(
+            run_ffmpeg_async(
+                nr,
+                worker_cmds[nr],
+                worker_stats[nr],
+                control,
+                config["timeout"],
+            )
+        )
+        for nr in range(worker_count)
+    ]
+    started = time.monotonic()
+    pending = set(tasks)
+    while pending:
+        done, pending = await asyncio.wait(
+            pending, timeout=0.5, return_when=asyncio.FIRST_COMPLETED
+        )
+        for task in done:
+            e = task.exception()
+            if e:
+                print(f"Worker {tasks.index(task)} generated an exception: {e}")
+                control.stop("generic_ffmpeg_failure")
+        if pending and not control.stopped.is_set():
+            elapsed = time.monotonic() - started
+            stop_reason = check_round(worker_stats, config, elapsed)
+            if stop_reason:
+                control.stop(stop_reason, failed=False)
+
+
+def workMan(worker_count: int, ffmpeg_cmd, run_config: dict = None) -> tuple:
+    # ffmpeg_cmd may be a list of commands (e.g. one per GPU), the workers are
+    # spread over them round robin
+    config = {**DEFAULT_RUN_CONFIG, **(run_config or {})}
+    ffmpeg_cmds = ffmpeg_cmd if isinstance(ffmpeg_cmd, list) else [ffmpeg_cmd]
+    placement = plan_placement(worker_count, config["placement"])
+    cpu_sets = placement or [None] * worker_count
+    worker_cmds = [
+        pinned_cmd(progress_cmd(ffmpeg_cmds[nr % len(ffmpeg_cmds)]), cpu_sets[nr])
+        for nr in range(worker_count)
+    ]
+    worker_stats = [WorkerStats(config["steady_window"]) for _ in range(worker_count)]
+    control = RoundControl(worker_count)  # The first failing worker stops all others
+    # click.echo(f"> Run with {worker_count} Processes")
+    sampler = None
+    if config["sample_rate"] and monitor.PROC_AVAILABLE:
+        sampler = monitor.ResourceSampler(
+            control.pids,
+            config["sample_rate"],
+            config["thermal_limit"],
+            config["freq_drop"],
+            config["cpu_clocks"],
+            config["abort_grace"],  # Start-up time, before clocks are compared
+        )
+        sampler.start()
+    round_args = (worker_count, worker_cmds, worker_stats, control, config)
+    try:
+        if config["engine"] == "asyncio":
+            import asyncio
+
+            asyncio.run(_run_round_asyncio(*round_args))
+        else:
+            _run_round_threads(*round_args)
+    finally:
+        resources = sampler.stop() if sampler else None
+
+    if control.failed:
+        # Run with failed Worker is not counted
+        return True, control.reason
+
+    window = concurrency_window(worker_stats)
+    run_data_raw = [stats.result(control.reason, window) for stats in worker_stats]
+    run_data = evaluateRunData(run_data_raw)
+    if window:
+        run_data["window_s"] = window[1] - window[0]
+    if resources:
+        thermal = resources.pop("thermal", None)
+        run_data["resources"] = resources
+        if thermal:
+            run_data["thermal"] = thermal
+    if placement:
+        run_data["placement"] = {
+            "mode": config["placement"],
+            "cpus": [hwi.format_cpulist(cpu_set) for cpu_set in placement],
+        }
+    if control.reason:
+        run_data["stopped"] = control.reason  # Round ended early on live progress
+    return False, run_data
 
 
 def evaluateRunData(run_data_raw: list) -> dict:
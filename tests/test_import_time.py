@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+
+# tests.test_import_time.py
+# A transcoding hardware benchmarking client (for Jellyfin)
+#    Copyright (C) 2024 BotBlake <B0TBlake@protonmail.com>
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, version 3 of the License.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+##########################################################################################
+import subprocess
+import sys
+import unittest
+
+IMPORT_BUDGET_MS = 200  # Cumulative import time of pytab (incl. pytab.core)
+HEAVY_MODULES = ("requests", "cpuinfo", "wmi", "asyncio")  # Imported on use only
+
+
+def import_times() -> dict:
+    # Cumulative import time (microseconds) per module of "import pytab.core"
+    process_output = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import pytab.core"],
+        capture_output=True,
+        universal_newlines=True,
+        check=True,
+    )
+    times = {}
+    for line in process_output.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, module = line[len("import time:") :].split("|")
+        module = module.strip()
+        times[module] = max(times.get(module, 0), int(cumulative))
+    return times
+
+
+class ImportTimeTest(unittest.TestCase):
+    def test_import_budget(self):
+        # Best of three, the first run may pay for a cold page cache
+        cumulative_ms = min(import_times()["pytab"] for _ in range(3)) / 1000
+        self.assertLessEqual(cumulative_ms, IMPORT_BUDGET_MS)
+
+    def test_heavy_modules_not_imported(self):
+        times = import_times()
+        for module in HEAVY_MODULES:
+            self.assertNotIn(module, times)
+
+
+if __name__ == "__main__":
+    unittest.main()